@@ -1,6 +1,23 @@
 """GhostStack Brain - RAG-powered code intelligence."""
 
-from ghoststack.brain.index import CodeIndex
-from ghoststack.brain.ingestor import FileIngestor
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from ghoststack.brain.index import CodeIndex
+    from ghoststack.brain.ingestor import FileIngestor
 
 __all__ = ["CodeIndex", "FileIngestor"]
+
+# Public names and the modules defining them, imported on first access so
+# that loading any brain submodule does not pull in chromadb
+_LAZY = {
+    "CodeIndex": "ghoststack.brain.index",
+    "FileIngestor": "ghoststack.brain.ingestor",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY:
+        return getattr(importlib.import_module(_LAZY[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
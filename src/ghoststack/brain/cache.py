@@ -0,0 +1,127 @@
+"""Persistent embedding cache backed by SQLite."""
+
+import sqlite3
+import struct
+from pathlib import Path
+
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+_QUERY_BATCH = 500
+
+# Version of the table layout, stored in PRAGMA user_version
+SCHEMA_VERSION = 1
+
+# struct format code and byte width for each supported precision
+PRECISIONS = {"fp32": ("f", 4), "fp16": ("e", 2)}
+
+
+def pack_vector(vector: list[float], precision: str = "fp32") -> bytes:
+    """Pack an embedding into little-endian floats of the given precision."""
+    code, _ = PRECISIONS[precision]
+    return struct.pack(f"<{len(vector)}{code}", *vector)
+
+
+def unpack_vector(blob: bytes, precision: str = "fp32") -> list[float]:
+    """Unpack an embedding produced by pack_vector."""
+    code, width = PRECISIONS[precision]
+    return list(struct.unpack(f"<{len(blob) // width}{code}", blob))
+
+
+class EmbeddingCache:
+    """On-disk map of text digest -> embedding vector.
+
+    Survives across runs, so re-indexing after a small change only embeds
+    the chunks whose text is new. Entries are keyed by the backend, model
+    and precision that produced them as well as the text, so switching any
+    of those never serves a vector from a different embedding space.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        precision: str = "fp32",
+        model: str = "",
+        backend: str = "",
+    ):
+        """Open (or create) the cache database.
+
+        Args:
+            path: Path to the SQLite database file.
+            precision: Storage precision, "fp32" or "fp16".
+            model: Name of the model whose embeddings are cached.
+            backend: Runtime producing them, e.g. "torch" or "onnx".
+        """
+        self.path = path
+        self.precision = precision
+        self.model = model
+        self.backend = backend
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Bring the table layout up to SCHEMA_VERSION, once per database."""
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version >= SCHEMA_VERSION:
+            return
+        with self._conn:
+            # Entries of the old table do not record which model made them
+            self._conn.execute("DROP TABLE IF EXISTS embeddings")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache ("
+                " key BLOB NOT NULL,"
+                " backend TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " precision TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " PRIMARY KEY (key, backend, model, precision)"
+                ") WITHOUT ROWID"
+            )
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def get_many(self, keys: list[bytes]) -> dict[bytes, list[float]]:
+        """Look up several embeddings at once.
+
+        Args:
+            keys: Text digests to look up.
+
+        Returns:
+            Mapping of the keys that were found to their embeddings.
+        """
+        found: dict[bytes, list[float]] = {}
+        for i in range(0, len(keys), _QUERY_BATCH):
+            batch = keys[i:i + _QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                "SELECT key, vector FROM embedding_cache"
+                " WHERE backend = ? AND model = ? AND precision = ?"
+                f" AND key IN ({placeholders})",
+                [self.backend, self.model, self.precision, *batch],
+            )
+            for key, blob in rows:
+                found[key] = unpack_vector(blob, self.precision)
+        return found
+
+    def put_many(self, items: dict[bytes, list[float]]) -> None:
+        """Store several embeddings in one transaction.
+
+        Args:
+            items: Mapping of text digest to embedding.
+        """
+        if not items:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache"
+                " (key, backend, model, precision, vector) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (key, self.backend, self.model, self.precision,
+                     pack_vector(vector, self.precision))
+                    for key, vector in items.items()
+                ],
+            )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
@@ -0,0 +1,67 @@
+"""Column-oriented container for the chunks of a file."""
+
+from dataclasses import dataclass, field
+from typing import Any
+
+# Chunk types whose span is measured in characters rather than lines
+_CHAR_SPAN_TYPES = {"chunk"}
+
+
+@dataclass
+class ChunkBatch:
+    """The chunks of one file, stored as parallel lists.
+
+    Chunk ``i`` is ``ids[i]``, ``contents[i]``, ``types[i]`` and so on.
+    Chunkers append plain values instead of building a dict per chunk,
+    and the index derives Chroma metadata only for rows it writes.
+    """
+
+    ids: list[str] = field(default_factory=list)
+    contents: list[str] = field(default_factory=list)
+    types: list[str | None] = field(default_factory=list)
+    names: list[str | None] = field(default_factory=list)
+    # Line numbers for definitions, character offsets for "chunk" windows
+    starts: list[int | None] = field(default_factory=list)
+    ends: list[int | None] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(
+        self,
+        chunk_id: str,
+        content: str,
+        chunk_type: str | None = None,
+        name: str | None = None,
+        start: int | None = None,
+        end: int | None = None,
+    ) -> None:
+        """Add a chunk to the batch."""
+        self.ids.append(chunk_id)
+        self.contents.append(content)
+        self.types.append(chunk_type)
+        self.names.append(name)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def metadata(self, i: int) -> dict[str, Any]:
+        """Build the index metadata for chunk ``i``.
+
+        Only columns that are set for the chunk produce keys.
+        """
+        chunk_type = self.types[i]
+        meta: dict[str, Any] = {}
+        if chunk_type is not None:
+            meta["type"] = chunk_type
+        if self.names[i] is not None:
+            meta["name"] = self.names[i]
+        if chunk_type in _CHAR_SPAN_TYPES:
+            meta["chunk_num"] = i
+            start_key, end_key = "start_char", "end_char"
+        else:
+            start_key, end_key = "start_line", "end_line"
+        if self.starts[i] is not None:
+            meta[start_key] = self.starts[i]
+        if self.ends[i] is not None:
+            meta[end_key] = self.ends[i]
+        return meta
@@ -1,55 +1,113 @@
 """Embedding model wrapper for code intelligence."""
 
 import hashlib
+import logging
+import os
+import struct
 import warnings
+from collections import OrderedDict
 from functools import lru_cache
+from pathlib import Path
 from typing import TYPE_CHECKING
 
+from ghoststack.brain.cache import PRECISIONS, EmbeddingCache, pack_vector, unpack_vector
+from ghoststack.brain.onnx_backend import MAX_SEQ_LENGTH, use_onnx
+
 if TYPE_CHECKING:
     from sentence_transformers import SentenceTransformer
 
+    from ghoststack.brain.onnx_backend import OnnxEmbedder
+
+
+logger = logging.getLogger(__name__)
 
 # Default model - good balance of speed and quality for code
 DEFAULT_MODEL = "all-MiniLM-L6-v2"
 
+# Maximum number of embeddings kept in memory per model
+EMBEDDING_CACHE_SIZE = 10_000
+
+# Texts per forward pass when encoding with the model
+ENCODE_BATCH_SIZE = 64
+
+# Padded tokens per forward pass, so batches of long chunks stay as cheap
+# as batches of short ones
+ENCODE_TOKEN_BUDGET = 8192
+
+# Rough token estimate for code, without running the tokenizer
+_CHARS_PER_TOKEN = 4
+
 # Flag to track if we're in fallback mode
 _USE_FALLBACK = False
 
+# Maps a uint32 onto [0, 2)
+_UINT32_SCALE = 2.0 / 2**32
+
+
+def _token_batches(texts: list[str]) -> list[list[int]]:
+    """Group text indices into forward passes bounded by padded token count.
+
+    Texts are taken shortest first, so each batch is padded to the length
+    of its last text; a batch closes when growing it would push batch size
+    times that length over ENCODE_TOKEN_BUDGET, or at ENCODE_BATCH_SIZE texts.
+    """
+    batches: list[list[int]] = []
+    batch: list[int] = []
+    for i in sorted(range(len(texts)), key=lambda i: len(texts[i])):
+        tokens = min(len(texts[i]) // _CHARS_PER_TOKEN + 1, MAX_SEQ_LENGTH)
+        if batch and (
+            len(batch) >= ENCODE_BATCH_SIZE or (len(batch) + 1) * tokens > ENCODE_TOKEN_BUDGET
+        ):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
 
 def _simple_hash_embedding(text: str, dimension: int = 384) -> list[float]:
     """Generate a simple hash-based embedding as fallback.
     
     This is NOT semantic, just for testing when sentence-transformers fails.
     """
-    import struct
-    
-    # Create deterministic pseudo-random values from text hash
-    hasher = hashlib.sha256(text.encode())
-    digest = hasher.digest()
-    
-    embedding = []
-    for i in range(dimension):
-        # Use different parts of hash for different dimensions
-        h = hashlib.sha256(digest + struct.pack('i', i)).digest()
-        # Convert first 4 bytes to float between -1 and 1
-        val = struct.unpack('f', h[:4])[0]
-        # Normalize to reasonable range
-        embedding.append((val % 2) - 1)
-    
-    return embedding
+    # One SHAKE-128 stream yields 4 bytes per dimension; each little-endian
+    # uint32 maps onto [-1, 1), so the output is always finite
+    digest = hashlib.shake_128(text.encode()).digest(dimension * 4)
+    return [v * _UINT32_SCALE - 1.0 for v in struct.unpack(f"<{dimension}I", digest)]
 
 
 @lru_cache(maxsize=1)
-def _get_model(model_name: str = DEFAULT_MODEL) -> "SentenceTransformer":
-    """Lazy-load the embedding model (cached)."""
+def _get_model(
+    model_name: str = DEFAULT_MODEL,
+    models_dir: Path | None = None,
+) -> tuple["SentenceTransformer | OnnxEmbedder", int, str]:
+    """Lazy-load the embedding model, its dimension and its backend (cached).
+
+    The backend is "onnx" or "torch", whichever actually loaded. models_dir
+    is where the ONNX backend keeps exported models.
+    """
     global _USE_FALLBACK
-    
+
+    if use_onnx():
+        try:
+            from ghoststack.brain.onnx_backend import OnnxEmbedder
+            model = OnnxEmbedder(model_name, models_dir)
+            return model, model.get_sentence_embedding_dimension(), "onnx"
+        except Exception as e:
+            logger.warning("ONNX backend unavailable, falling back to PyTorch: %s", e)
+
     try:
         # Suppress warnings during import
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
             from sentence_transformers import SentenceTransformer
-        return SentenceTransformer(model_name)
+        model = SentenceTransformer(model_name)
+
+        # Use every core for CPU inference
+        import torch
+        torch.set_num_threads(os.cpu_count() or 1)
+        return model, model.get_sentence_embedding_dimension(), "torch"
     except Exception as e:
         _USE_FALLBACK = True
         raise RuntimeError(f"Failed to load sentence-transformers: {e}")
@@ -58,67 +116,182 @@ def _get_model(model_name: str = DEFAULT_MODEL) -> "SentenceTransformer":
 class EmbeddingModel:
     """Wrapper for generating text embeddings."""
 
-    def __init__(self, model_name: str = DEFAULT_MODEL, use_fallback: bool = False):
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        use_fallback: bool = False,
+        cache_path: Path | None = None,
+        precision: str = "fp32",
+        models_dir: Path | None = None,
+    ):
         """Initialize with the specified model.
         
         Args:
             model_name: Name of the sentence-transformers model.
             use_fallback: If True, use hash-based fallback instead of real embeddings.
+            cache_path: Optional SQLite file for persisting model embeddings.
+            precision: "fp32", or "fp16" to round embeddings to half precision.
+                fp16 halves cache size at a negligible cost in search quality;
+                vectors are still handed to Chroma as regular floats.
+            models_dir: Where the ONNX backend keeps exported models.
         """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unsupported precision: {precision!r}")
+
         self.model_name = model_name
+        self.precision = precision
         self._model = None
         self._fallback = use_fallback
         self._dimension = 384  # Default for MiniLM
+        self._model_dimension: int | None = None
+        # Backend of the loaded model, which may not be the one requested
+        self._backend: str | None = None
+        # LRU of text digest -> packed embedding, so repeated snippets embed once
+        self._cache: OrderedDict[bytes, bytes] = OrderedDict()
+        self._cache_path = cache_path
+        self._models_dir = models_dir
+        self._disk_cache: EmbeddingCache | None = None
 
     @property
-    def model(self) -> "SentenceTransformer":
+    def model(self) -> "SentenceTransformer | OnnxEmbedder":
         """Get the model, loading it on first access."""
         if self._fallback:
             raise RuntimeError("Model disabled, using fallback")
         if self._model is None:
             try:
-                self._model = _get_model(self.model_name)
+                self._model, self._model_dimension, self._backend = _get_model(
+                    self.model_name, self._models_dir
+                )
             except RuntimeError:
                 self._fallback = True
                 raise
+            if self._disk_cache is not None:
+                # ONNX may have failed over to torch; file vectors under the
+                # backend that really computes them
+                self._disk_cache.backend = self._backend
         return self._model
 
-    def embed(self, text: str) -> list[float]:
-        """Generate embedding for a single text."""
+    @staticmethod
+    def _cache_key(text: str) -> bytes:
+        """Digest identifying a text in the embedding cache."""
+        return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+    def _cache_get(self, key: bytes) -> list[float] | None:
+        """Look up a cached embedding, marking it most recently used."""
+        packed = self._cache.get(key)
+        if packed is None:
+            return None
+        self._cache.move_to_end(key)
+        return unpack_vector(packed, self.precision)
+
+    def _cache_put(self, key: bytes, embedding: list[float]) -> None:
+        """Cache an embedding, evicting the least recently used if full."""
+        self._cache[key] = pack_vector(embedding, self.precision)
+        self._cache.move_to_end(key)
+        if len(self._cache) > EMBEDDING_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    @property
+    def disk_cache(self) -> EmbeddingCache | None:
+        """Get the persistent cache, opening it on first access."""
+        if self._disk_cache is None and self._cache_path is not None:
+            self._disk_cache = EmbeddingCache(
+                self._cache_path,
+                self.precision,
+                model=self.model_name,
+                backend=self._backend or ("onnx" if use_onnx() else "torch"),
+            )
+        return self._disk_cache
+
+    def _hash_embed(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts with the hash fallback at the configured precision."""
+        embeddings = [_simple_hash_embedding(t, self._dimension) for t in texts]
+        if self.precision == "fp16":
+            embeddings = [unpack_vector(pack_vector(e, "fp16"), "fp16") for e in embeddings]
+        return embeddings
+
+    def _encode(self, texts: list[str]) -> list[list[float]]:
+        """Embed texts with the model, bypassing the cache."""
         if self._fallback:
-            return _simple_hash_embedding(text, self._dimension)
+            return self._hash_embed(texts)
         
         try:
-            embedding = self.model.encode(text, convert_to_numpy=True)
-            return embedding.tolist()
+            out: list[list[float]] = [[] for _ in texts]
+            for batch in _token_batches(texts):
+                embeddings = self.model.encode(
+                    [texts[i] for i in batch],
+                    batch_size=len(batch),
+                    convert_to_numpy=True,
+                    show_progress_bar=False,
+                )
+                if self.precision == "fp16":
+                    embeddings = embeddings.astype("float16")
+                for i, embedding in zip(batch, embeddings):
+                    out[i] = embedding.tolist()
+            return out
         except Exception:
             self._fallback = True
-            return _simple_hash_embedding(text, self._dimension)
+            return self._hash_embed(texts)
+
+    def embed(self, text: str) -> list[float]:
+        """Generate embedding for a single text."""
+        return self.embed_batch([text])[0]
 
     def embed_batch(self, texts: list[str]) -> list[list[float]]:
-        """Generate embeddings for multiple texts."""
+        """Generate embeddings for multiple texts.
+
+        Texts found in the in-memory or on-disk cache are not sent to the model,
+        and texts repeated within the batch are embedded once.
+        """
         if not texts:
             return []
-        
-        if self._fallback:
-            return [_simple_hash_embedding(t, self._dimension) for t in texts]
-        
-        try:
-            embeddings = self.model.encode(texts, convert_to_numpy=True)
-            return [e.tolist() for e in embeddings]
-        except Exception:
-            self._fallback = True
-            return [_simple_hash_embedding(t, self._dimension) for t in texts]
+
+        keys = [self._cache_key(t) for t in texts]
+        embeddings = [self._cache_get(k) for k in keys]
+
+        # Digest -> index of the first text with that digest, for each miss
+        misses: dict[bytes, int] = {}
+        for i, embedding in enumerate(embeddings):
+            if embedding is None:
+                misses.setdefault(keys[i], i)
+        if not misses:
+            return embeddings
+
+        found: dict[bytes, list[float]] = {}
+
+        # Hash embeddings are cheaper to recompute than to look up
+        disk_cache = None if self._fallback else self.disk_cache
+        if disk_cache is not None:
+            found = disk_cache.get_many(list(misses))
+            for key, embedding in found.items():
+                self._cache_put(key, embedding)
+                del misses[key]
+
+        if misses:
+            encoded = self._encode([texts[i] for i in misses.values()])
+            computed = dict(zip(misses, encoded))
+            for key, embedding in computed.items():
+                self._cache_put(key, embedding)
+            found.update(computed)
+
+            # The model may have failed over to hash embeddings mid-batch
+            if disk_cache is not None and not self._fallback:
+                disk_cache.put_many(computed)
+
+        return [e if e is not None else found[k] for e, k in zip(embeddings, keys)]
 
     @property
     def dimension(self) -> int:
         """Get the embedding dimension."""
         if self._fallback:
             return self._dimension
-        try:
-            return self.model.get_sentence_embedding_dimension()
-        except Exception:
-            return self._dimension
+        if self._model is None:
+            try:
+                self.model
+            except Exception:
+                return self._dimension
+        # Read once at load time; some models do not report a dimension
+        return self._model_dimension or self._dimension
     
     @property
     def is_fallback(self) -> bool:
@@ -1,27 +1,49 @@
 """Code index using ChromaDB for semantic search."""
 
+import asyncio
 import hashlib
+from collections.abc import Callable
 from pathlib import Path
 from typing import Any
 
 import chromadb
 from chromadb.config import Settings
 
+from ghoststack.brain.chunks import ChunkBatch
 from ghoststack.brain.embeddings import EmbeddingModel
 
+# Document IDs are paths with "/" and "." replaced, done in one C-level pass
+_DOC_ID_TABLE = str.maketrans("/.", "__")
+
+# Maximum number of rows per Chroma add/update/upsert call
+WRITE_BATCH_SIZE = 512
+
 
 class CodeIndex:
     """ChromaDB-based code index for semantic search."""
 
     COLLECTION_NAME = "ghoststack_code"
 
-    def __init__(self, db_path: Path):
+    # Chroma always stores float32, but fp16-rounded vectors halve the
+    # embedding cache and keep cosine rankings practically unchanged
+    EMBEDDING_PRECISION = "fp16"
+
+    def __init__(
+        self,
+        db_path: Path,
+        embedding_cache_path: Path | None = None,
+        models_dir: Path | None = None,
+    ):
         """Initialize the code index.
 
         Args:
             db_path: Path to the ChromaDB storage directory.
+            embedding_cache_path: Optional SQLite file for persisting embeddings.
+            models_dir: Where the ONNX backend keeps exported models.
         """
         self.db_path = db_path
+        self.embedding_cache_path = embedding_cache_path
+        self.models_dir = models_dir
         self.db_path.mkdir(parents=True, exist_ok=True)
 
         # Initialize ChromaDB with persistent storage
@@ -36,6 +58,10 @@ class CodeIndex:
             metadata={"description": "GhostStack code embeddings"},
         )
 
+        # Largest write the client accepts in one call (older clients don't say)
+        get_max_batch_size = getattr(self._client, "get_max_batch_size", None)
+        self._max_batch_size = get_max_batch_size() if get_max_batch_size else WRITE_BATCH_SIZE
+
         # Lazy-load embedding model
         self._embedder = None
 
@@ -43,12 +69,19 @@ class CodeIndex:
     def embedder(self) -> EmbeddingModel:
         """Get the embedding model (lazy-loaded)."""
         if self._embedder is None:
-            self._embedder = EmbeddingModel(use_fallback=True)  # Use fallback for now
+            self._embedder = EmbeddingModel(
+                use_fallback=True,  # Use fallback for now
+                cache_path=self.embedding_cache_path,
+                precision=self.EMBEDDING_PRECISION,
+                models_dir=self.models_dir,
+            )
         return self._embedder
 
     @staticmethod
     def _hash_content(content: str) -> str:
         """Generate a hash of the content for change detection."""
+        # SHA-256 is hardware-accelerated on current CPUs and measured faster
+        # than blake2b for chunk-sized inputs, so it stays the primitive here.
         return hashlib.sha256(content.encode()).hexdigest()[:16]
 
     def add_file(
@@ -56,6 +89,7 @@ class CodeIndex:
         file_path: str,
         content: str,
         metadata: dict[str, Any] | None = None,
+        skip_existence_check: bool = False,
     ) -> str:
         """Add or update a file in the index.
 
@@ -63,20 +97,23 @@ class CodeIndex:
             file_path: Relative path to the file.
             content: The file content to index.
             metadata: Optional metadata (language, etc.).
+            skip_existence_check: If True, upsert without first checking
+                whether the same content is already indexed.
 
         Returns:
             The document ID.
         """
-        doc_id = file_path.replace("/", "_").replace(".", "_")
+        doc_id = file_path.translate(_DOC_ID_TABLE)
         content_hash = self._hash_content(content)
 
         # Check if file is already indexed with same content
-        existing = self._collection.get(ids=[doc_id], include=["metadatas"])
-        if existing["ids"] and existing["metadatas"]:
-            existing_meta = existing["metadatas"][0]
-            if existing_meta.get("content_hash") == content_hash:
-                # Content unchanged, skip re-indexing
-                return doc_id
+        if not skip_existence_check:
+            existing = self._collection.get(ids=[doc_id], include=["metadatas"])
+            if existing["ids"] and existing["metadatas"]:
+                existing_meta = existing["metadatas"][0]
+                if existing_meta.get("content_hash") == content_hash:
+                    # Content unchanged, skip re-indexing
+                    return doc_id
 
         # Generate embedding
         embedding = self.embedder.embed(content)
@@ -116,32 +153,164 @@ class CodeIndex:
         Returns:
             The document ID.
         """
-        doc_id = f"{file_path}::{chunk_id}".replace("/", "_").replace(".", "_")
-        content_hash = self._hash_content(content)
+        batch = ChunkBatch()
+        batch.append(chunk_id, content)
+        return self.add_chunk_batch(file_path, batch, metadata)[0]
 
-        # Check for existing
-        existing = self._collection.get(ids=[doc_id], include=["metadatas"])
-        if existing["ids"] and existing["metadatas"]:
-            if existing["metadatas"][0].get("content_hash") == content_hash:
-                return doc_id
+    def add_chunk_batch(
+        self,
+        file_path: str,
+        batch: ChunkBatch,
+        shared_metadata: dict[str, Any] | None = None,
+        skip_existence_check: bool = False,
+    ) -> list[str]:
+        """Add all chunks of a file to the index in one batch.
 
-        embedding = self.embedder.embed(content)
+        Args:
+            file_path: Relative path to the source file.
+            batch: The file's chunks.
+            shared_metadata: Optional metadata applied to every chunk.
+            skip_existence_check: See ``add_files_bulk``.
 
-        meta = {
-            "file_path": file_path,
-            "chunk_id": chunk_id,
-            "content_hash": content_hash,
-            **(metadata or {}),
-        }
+        Returns:
+            The document IDs of all chunks, including unchanged ones.
+        """
+        return self.add_files_bulk(
+            [(file_path, batch, shared_metadata)],
+            skip_existence_check=skip_existence_check,
+        )
 
-        self._collection.upsert(
-            ids=[doc_id],
-            embeddings=[embedding],
-            documents=[content],
-            metadatas=[meta],
+    def add_files_bulk(
+        self,
+        files: list[tuple[str, ChunkBatch, dict[str, Any] | None]],
+        skip_existence_check: bool = False,
+    ) -> list[str]:
+        """Add the chunks of several files to the index in one batch.
+
+        Unchanged chunks are skipped; the rest are embedded with a single
+        ``embed_batch`` call and written in batched Chroma calls.
+
+        Args:
+            files: List of (file_path, batch, shared_metadata) tuples.
+            skip_existence_check: If True, upsert every chunk without reading
+                back stored content hashes. For callers that already know the
+                files changed (e.g. from a file-level hash cache).
+
+        Returns:
+            The document IDs of all chunks, including unchanged ones.
+        """
+        # Key by document ID; a repeated chunk ID keeps the last chunk,
+        # matching what successive upserts would have left behind
+        by_id: dict[str, tuple[str, ChunkBatch, int, dict[str, Any] | None]] = {}
+        for file_path, batch, shared_metadata in files:
+            base_id = file_path.translate(_DOC_ID_TABLE)
+            for i, chunk_id in enumerate(batch.ids):
+                doc_id = f"{base_id}::{chunk_id.translate(_DOC_ID_TABLE)}"
+                by_id[doc_id] = (file_path, batch, i, shared_metadata)
+
+        ids = list(by_id)
+        if not ids:
+            return []
+
+        contents = {doc_id: batch.contents[i] for doc_id, (_, batch, i, _) in by_id.items()}
+        hashes = {doc_id: self._hash_content(content) for doc_id, content in contents.items()}
+
+        if skip_existence_check:
+            existing_hashes = None
+            changed = ids
+        else:
+            # One round-trip to find chunks already indexed with the same content
+            existing = self._collection.get(ids=ids, include=["metadatas"])
+            existing_hashes = {
+                doc_id: (meta or {}).get("content_hash")
+                for doc_id, meta in zip(existing["ids"], existing["metadatas"] or [])
+            }
+            changed = [doc_id for doc_id in ids if existing_hashes.get(doc_id) != hashes[doc_id]]
+            if not changed:
+                return ids
+
+        documents = [contents[doc_id] for doc_id in changed]
+        embeddings = self.embedder.embed_batch(documents)
+
+        metadatas = []
+        for doc_id in changed:
+            file_path, batch, i, shared_metadata = by_id[doc_id]
+            metadatas.append({
+                "file_path": file_path,
+                "chunk_id": batch.ids[i],
+                "content_hash": hashes[doc_id],
+                **(shared_metadata or {}),
+                **batch.metadata(i),
+            })
+
+        if existing_hashes is None:
+            self.bulk_upsert(changed, embeddings, documents, metadatas)
+            return ids
+
+        # New rows go through add, stale ones through update, so Chroma
+        # never has to resolve existence itself
+        fresh = [i for i, doc_id in enumerate(changed) if doc_id not in existing_hashes]
+        stale = [i for i, doc_id in enumerate(changed) if doc_id in existing_hashes]
+        for write, positions in ((self._collection.add, fresh), (self._collection.update, stale)):
+            if positions:
+                self._write_batches(
+                    write,
+                    ids=[changed[i] for i in positions],
+                    embeddings=[embeddings[i] for i in positions],
+                    documents=[documents[i] for i in positions],
+                    metadatas=[metadatas[i] for i in positions],
+                )
+
+        return ids
+
+    def bulk_upsert(
+        self,
+        ids: list[str],
+        embeddings: list[list[float]],
+        documents: list[str],
+        metadatas: list[dict[str, Any]],
+        batch_size: int = WRITE_BATCH_SIZE,
+    ) -> None:
+        """Upsert precomputed rows, issuing one Chroma call per batch.
+
+        Args:
+            ids: Document IDs.
+            embeddings: Embedding for each document.
+            documents: Document text.
+            metadatas: Metadata for each document.
+            batch_size: Maximum number of rows per Chroma call.
+        """
+        self._write_batches(
+            self._collection.upsert,
+            ids=ids,
+            embeddings=embeddings,
+            documents=documents,
+            metadatas=metadatas,
+            batch_size=batch_size,
         )
 
-        return doc_id
+    def _write_batches(
+        self,
+        write: Callable[..., Any],
+        ids: list[str],
+        embeddings: list[list[float]],
+        documents: list[str],
+        metadatas: list[dict[str, Any]],
+        batch_size: int = WRITE_BATCH_SIZE,
+    ) -> None:
+        """Call a Chroma write method (add/update/upsert) in slices.
+
+        Slices never exceed the client's own maximum batch size.
+        """
+        batch_size = min(batch_size, self._max_batch_size)
+        for start in range(0, len(ids), batch_size):
+            end = start + batch_size
+            write(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+            )
 
     def search(
         self,
@@ -173,17 +342,22 @@ class CodeIndex:
             include=["documents", "metadatas", "distances"],
         )
 
-        # Format results
+        return self._format_results(results, 0)
+
+    @staticmethod
+    def _format_results(results: dict[str, Any], q: int) -> list[dict[str, Any]]:
+        """Format the matches for query ``q`` of a Chroma query result."""
         formatted = []
-        if results["ids"] and results["ids"][0]:
-            for i, doc_id in enumerate(results["ids"][0]):
+        if results["ids"] and results["ids"][q]:
+            metadatas = results["metadatas"][q]
+            for i, doc_id in enumerate(results["ids"][q]):
                 formatted.append({
                     "id": doc_id,
-                    "file_path": results["metadatas"][0][i].get("file_path", ""),
-                    "chunk_id": results["metadatas"][0][i].get("chunk_id"),
-                    "content": results["documents"][0][i] if results["documents"] else "",
-                    "distance": results["distances"][0][i] if results["distances"] else 0,
-                    "metadata": results["metadatas"][0][i],
+                    "file_path": metadatas[i].get("file_path", ""),
+                    "chunk_id": metadatas[i].get("chunk_id"),
+                    "content": results["documents"][q][i] if results["documents"] else "",
+                    "distance": results["distances"][q][i] if results["distances"] else 0,
+                    "metadata": metadatas[i],
                 })
 
         return formatted
@@ -206,22 +380,36 @@ class CodeIndex:
             List of related files with relevance scores.
         """
         related = {}
-
-        for file_path in changed_files:
-            # Get the content of the changed file from the index
-            doc_id = file_path.replace("/", "_").replace(".", "_")
-            result = self._collection.get(ids=[doc_id], include=["documents"])
-
-            if result["documents"] and result["documents"][0]:
-                content = result["documents"][0]
-                # Search for related files, excluding the changed files
-                matches = self.search(
-                    query=content[:2000],  # Limit query size
-                    n_results=n_results + len(changed_files),
-                    file_filter=changed_files,
-                )
-
-                for match in matches:
+        if not changed_files:
+            return []
+
+        # Fetch the stored embeddings of the changed files' chunks in one
+        # round-trip; they were computed at index time, so nothing is re-embedded
+        result = self._collection.get(
+            where={"file_path": {"$in": changed_files}},
+            include=["embeddings", "metadatas"],
+        )
+        vectors: dict[str, list] = {}
+        embeddings = result["embeddings"] if result["embeddings"] is not None else []
+        for embedding, metadata in zip(embeddings, result["metadatas"] or []):
+            vectors.setdefault(metadata["file_path"], []).append(embedding)
+
+        if vectors:
+            # One query per changed file, at the centroid of its chunks
+            queries = [
+                [float(sum(column)) / len(chunks) for column in zip(*chunks)]
+                for chunks in vectors.values()
+            ]
+            results = self._collection.query(
+                query_embeddings=queries,
+                n_results=n_results + len(changed_files),
+                where={"file_path": {"$nin": changed_files}},
+                # Only paths and scores are reported, so leave the chunk text behind
+                include=["metadatas", "distances"],
+            )
+
+            for q in range(len(queries)):
+                for match in self._format_results(results, q):
                     path = match["file_path"]
                     if path not in changed_files:
                         if path not in related or match["distance"] < related[path]["distance"]:
@@ -230,6 +418,18 @@ class CodeIndex:
         # Sort by relevance (lower distance = more relevant)
         return sorted(related.values(), key=lambda x: x["distance"])
 
+    async def get_related_files_async(
+        self,
+        changed_files: list[str],
+        n_results: int = 5,
+    ) -> list[dict[str, Any]]:
+        """Find files related to a set of changed files without blocking the event loop.
+
+        The embedded Chroma client is synchronous, so the lookup (already a
+        single batched embed and query) runs in a worker thread.
+        """
+        return await asyncio.to_thread(self.get_related_files, changed_files, n_results)
+
     def remove_file(self, file_path: str) -> bool:
         """Remove a file from the index.
 
@@ -239,7 +439,7 @@ class CodeIndex:
         Returns:
             True if removed, False if not found.
         """
-        doc_id = file_path.replace("/", "_").replace(".", "_")
+        doc_id = file_path.translate(_DOC_ID_TABLE)
         try:
             self._collection.delete(ids=[doc_id])
             return True
@@ -2,12 +2,23 @@
 
 import ast
 import hashlib
-import json
+import mmap
+import multiprocessing
+import os
 import re
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Generator
+from typing import TYPE_CHECKING, Generator
 
-from ghoststack.brain.index import CodeIndex
+from ghoststack.brain.chunks import ChunkBatch
+from ghoststack.utils import jsonio
+from ghoststack.utils.fs import atomic_write_bytes
+
+if TYPE_CHECKING:
+    from ghoststack.brain.index import CodeIndex
 
 
 # File extensions to index by language
@@ -62,11 +73,94 @@ MAX_FILE_SIZE = 500_000  # 500KB
 CHUNK_SIZE = 2000
 CHUNK_OVERLAP = 200
 
+# Chunks accumulated across files before one embed + write
+INDEX_BATCH_SIZE = 512
+
+# Estimated tokens accumulated before one embed + write, so batches of long
+# chunks stay as bounded in latency and memory as batches of short ones
+INDEX_TOKEN_BUDGET = 64_000
+
+# Rough characters per token for source code
+_CHARS_PER_TOKEN = 4
+
+# Threads reading, hashing and chunking files ahead of the index writer
+READ_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# Fewer files than this left to prepare are not worth starting worker
+# processes for, as spawning each one re-imports the chunkers
+PROCESS_POOL_MIN_FILES = 64
+
+# Hash log entries buffered before they are appended and fsynced
+HASH_LOG_SYNC_EVERY = 64
+
+# Files modified this recently may change again within the same mtime tick,
+# so their stat is not trusted to prove them unchanged on the next run
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+class _DefinitionCollector(ast.NodeVisitor):
+    """Collect class and function definitions in source order.
+
+    Unlike ``ast.walk``, only statement bodies are traversed, so the
+    expressions that make up most of the tree are never visited. Function
+    bodies are skipped (nested helpers are part of their parent's chunk);
+    class bodies are entered so methods get chunks of their own.
+    """
+
+    # Statement-list fields that can hold definitions (if/try/with/match...)
+    _BODY_FIELDS = ("body", "handlers", "orelse", "finalbody", "cases")
+
+    def __init__(self) -> None:
+        self.definitions: list[ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef] = []
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        self.definitions.append(node)
+
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
+        self.definitions.append(node)
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self.definitions.append(node)
+        self.generic_visit(node)
+
+    def generic_visit(self, node: ast.AST) -> None:
+        for field in self._BODY_FIELDS:
+            for child in getattr(node, field, ()):
+                self.visit(child)
+
+
+@dataclass
+class PreparedFile:
+    """A file that has been read and chunked, ready to be indexed."""
+
+    rel_path: str
+    content_hash: str
+    # None when the content matched the hash cache and only the stat changed
+    chunks: ChunkBatch | None
+    language: str
+    # (mtime_ns, size), or None if too recent to trust
+    stat: tuple[int, int] | None = None
+
+
+# The ingestor copy each worker process prepares files with
+_worker_ingestor: "FileIngestor | None" = None
+
+
+def _init_worker(ingestor: "FileIngestor") -> None:
+    """Install the ingestor a worker process prepares files with."""
+    global _worker_ingestor
+    _worker_ingestor = ingestor
+
+
+def _prepare_file_worker(path: Path, force: bool) -> "PreparedFile | None":
+    """Prepare a file in a worker process."""
+    return _worker_ingestor._prepare_file(path, force)
+
 
 class FileIngestor:
     """Scans and indexes code files into the vector database."""
 
-    def __init__(self, repo_path: Path, index: CodeIndex):
+    def __init__(self, repo_path: Path, index: "CodeIndex"):
         """Initialize the ingestor.
 
         Args:
@@ -76,42 +170,170 @@ class FileIngestor:
         self.repo_path = repo_path
         self.index = index
         self._hash_cache_path = repo_path / ".ghoststack" / "file_hashes.json"
+        # Changes since the last snapshot, one JSON [rel_path, hash, *stat] per line
+        self._hash_log_path = repo_path / ".ghoststack" / "file_hashes.log"
         self._hash_cache: dict[str, str] = {}
+        # (mtime_ns, size) of each file when its hash was taken
+        self._stat_cache: dict[str, tuple[int, int]] = {}
+        self._hash_log_pending: list[bytes] = []
         self._load_hash_cache()
 
+    def __getstate__(self) -> dict:
+        """Pickle without the index: worker processes only prepare files."""
+        state = self.__dict__.copy()
+        state["index"] = None
+        state["_hash_log_pending"] = []
+        return state
+
     def _load_hash_cache(self) -> None:
-        """Load the file hash cache from disk."""
+        """Load the file hash cache: the snapshot, then the log replayed on top."""
         if self._hash_cache_path.exists():
             try:
-                with open(self._hash_cache_path) as f:
-                    self._hash_cache = json.load(f)
-            except (json.JSONDecodeError, IOError):
+                snapshot = jsonio.loads(self._hash_cache_path.read_bytes())
+                # Values are [hash, mtime_ns, size], or a bare hash
+                for rel_path, entry in snapshot.items():
+                    if isinstance(entry, str):
+                        self._hash_cache[rel_path] = entry
+                    else:
+                        self._hash_cache[rel_path] = entry[0]
+                        self._stat_cache[rel_path] = (entry[1], entry[2])
+            except (ValueError, OSError, IndexError, TypeError):
                 self._hash_cache = {}
+                self._stat_cache = {}
+
+        try:
+            log = self._hash_log_path.read_bytes()
+        except OSError:
+            return
+
+        lines = log.split(b"\n")
+        if lines[-1]:
+            # Drop the torn last line of an interrupted run, so the next
+            # append does not get glued onto it
+            os.truncate(self._hash_log_path, len(log) - len(lines[-1]))
+        for line in lines[:-1]:
+            try:
+                rel_path, file_hash, *stat = jsonio.loads(line)
+            except (ValueError, TypeError):
+                continue
+            self._set_hash(rel_path, file_hash, tuple(stat) if len(stat) == 2 else None)
+
+    def _set_hash(
+        self,
+        rel_path: str,
+        file_hash: str | None,
+        stat: tuple[int, int] | None = None,
+    ) -> None:
+        """Update the in-memory caches for one file."""
+        if file_hash is None:
+            self._hash_cache.pop(rel_path, None)
+        else:
+            self._hash_cache[rel_path] = file_hash
+        if stat is None:
+            self._stat_cache.pop(rel_path, None)
+        else:
+            self._stat_cache[rel_path] = stat
+
+    def _log_hash(
+        self,
+        rel_path: str,
+        file_hash: str | None,
+        stat: tuple[int, int] | None = None,
+    ) -> None:
+        """Record a file's hash and stat, or forget the file if file_hash is None.
+
+        The change is appended to the hash log in fsynced groups, so an
+        interrupted run keeps the progress it made.
+        """
+        self._set_hash(rel_path, file_hash, stat)
+        entry = [rel_path, file_hash, *stat] if stat else [rel_path, file_hash]
+        self._hash_log_pending.append(jsonio.dumps(entry) + b"\n")
+        if len(self._hash_log_pending) >= HASH_LOG_SYNC_EVERY:
+            self._flush_hash_log()
+
+    def _flush_hash_log(self) -> None:
+        """Append buffered hash changes to the log and sync it to disk."""
+        if not self._hash_log_pending:
+            return
+        self._hash_log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._hash_log_path, "ab") as f:
+            f.writelines(self._hash_log_pending)
+            f.flush()
+            os.fsync(f.fileno())
+        self._hash_log_pending = []
 
     def _save_hash_cache(self) -> None:
-        """Save the file hash cache to disk."""
-        self._hash_cache_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(self._hash_cache_path, "w") as f:
-            json.dump(self._hash_cache, f, indent=2)
+        """Save the file hash cache to disk.
+
+        Flushes the log, and compacts it into the snapshot once the log is
+        more than twice the size of the snapshot. Either most of its lines
+        are stale by then, or the live entries have doubled, so rewriting
+        the snapshot costs amortized constant time per change.
+        """
+        self._flush_hash_log()
+        try:
+            log_size = self._hash_log_path.stat().st_size
+        except FileNotFoundError:
+            return
+        try:
+            snapshot_size = self._hash_cache_path.stat().st_size
+        except FileNotFoundError:
+            snapshot_size = 0
+        if log_size > 2 * snapshot_size:
+            # A crash between these steps is harmless: replaying the log
+            # over the new snapshot yields the same state
+            snapshot = {
+                rel_path: [file_hash, *self._stat_cache[rel_path]]
+                if rel_path in self._stat_cache
+                else file_hash
+                for rel_path, file_hash in self._hash_cache.items()
+            }
+            atomic_write_bytes(self._hash_cache_path, jsonio.dumps(snapshot, indent=True))
+            os.truncate(self._hash_log_path, 0)
+
+    def clear_hash_cache(self) -> None:
+        """Forget all file hashes so the next run re-indexes every file.
+
+        Must accompany clearing the index: changed-file detection trusts
+        this cache rather than re-checking the index.
+        """
+        self._hash_cache = {}
+        self._stat_cache = {}
+        self._hash_log_pending = []
+        self._hash_cache_path.unlink(missing_ok=True)
+        self._hash_log_path.unlink(missing_ok=True)
 
     @staticmethod
     def _hash_file(path: Path) -> str:
         """Generate a hash of file content for change detection."""
-        hasher = hashlib.sha256()
         with open(path, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
-                hasher.update(chunk)
+            if hasattr(hashlib, "file_digest"):
+                # Python 3.11+: the read/hash loop runs in C
+                hasher = hashlib.file_digest(f, "sha256")
+            else:
+                hasher = hashlib.sha256()
+                # mmap refuses empty files; those hash as empty input
+                if os.fstat(f.fileno()).st_size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        hasher.update(mm)
+        # SHA-256 is hardware accelerated (SHA-NI) on most current CPUs
         return hasher.hexdigest()[:16]
 
-    def _should_index(self, path: Path) -> bool:
-        """Check if a file should be indexed."""
+    def _should_index(self, path: Path, entry: os.DirEntry | None = None) -> bool:
+        """Check if a file should be indexed.
+
+        Args:
+            path: Path to the file.
+            entry: The file's directory entry, if known, to reuse its stat.
+        """
         # Check extension
         if path.suffix.lower() not in SUPPORTED_EXTENSIONS:
             return False
 
         # Check file size
         try:
-            if path.stat().st_size > MAX_FILE_SIZE:
+            stat = entry.stat() if entry is not None else path.stat()
+            if stat.st_size > MAX_FILE_SIZE:
                 return False
         except OSError:
             return False
@@ -128,15 +350,29 @@ class FileIngestor:
         Yields:
             Path objects for each file to index.
         """
-        for path in self.repo_path.rglob("*"):
-            # Skip directories in SKIP_DIRS
-            if any(skip in path.parts for skip in SKIP_DIRS):
+        # Depth-first walk that never enters a skipped directory
+        stack = [str(self.repo_path)]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
                 continue
-
-            if path.is_file() and self._should_index(path):
-                yield path
-
-    def _chunk_python(self, content: str, file_path: str) -> list[dict]:
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in SKIP_DIRS:
+                                stack.append(entry.path)
+                            continue
+                        is_file = entry.is_file()
+                    except OSError:
+                        continue
+                    if is_file:
+                        path = Path(entry.path)
+                        if self._should_index(path, entry):
+                            yield path
+
+    def _chunk_python(self, content: str, file_path: str) -> ChunkBatch:
         """Chunk Python code by function and class definitions.
 
         Args:
@@ -144,10 +380,8 @@ class FileIngestor:
             file_path: Path to the file (for metadata).
 
         Returns:
-            List of chunks with id, content, and metadata.
+            The file's chunks.
         """
-        chunks = []
-
         try:
             tree = ast.parse(content)
         except SyntaxError:
@@ -155,42 +389,31 @@ class FileIngestor:
             return self._chunk_by_lines(content, file_path)
 
         lines = content.split("\n")
-
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
-                start_line = node.lineno - 1
-                end_line = node.end_lineno if hasattr(node, "end_lineno") else start_line + 1
-
-                chunk_content = "\n".join(lines[start_line:end_line])
-                chunk_id = f"{node.name}"
-
-                if isinstance(node, ast.ClassDef):
-                    chunk_type = "class"
-                else:
-                    chunk_type = "function"
-
-                chunks.append({
-                    "id": chunk_id,
-                    "content": chunk_content,
-                    "metadata": {
-                        "type": chunk_type,
-                        "name": node.name,
-                        "start_line": start_line + 1,
-                        "end_line": end_line,
-                    },
-                })
+        chunks = ChunkBatch()
+
+        collector = _DefinitionCollector()
+        collector.visit(tree)
+
+        for node in collector.definitions:
+            start_line = node.lineno - 1
+            end_line = node.end_lineno if hasattr(node, "end_lineno") else start_line + 1
+
+            chunks.append(
+                chunk_id=node.name,
+                content="\n".join(lines[start_line:end_line]),
+                chunk_type="class" if isinstance(node, ast.ClassDef) else "function",
+                name=node.name,
+                start=start_line + 1,
+                end=end_line,
+            )
 
         # If no chunks found, fall back to whole file
         if not chunks:
-            chunks.append({
-                "id": "module",
-                "content": content[:CHUNK_SIZE],
-                "metadata": {"type": "module"},
-            })
+            chunks.append("module", content[:CHUNK_SIZE], chunk_type="module")
 
         return chunks
 
-    def _chunk_by_lines(self, content: str, file_path: str) -> list[dict]:
+    def _chunk_by_lines(self, content: str, file_path: str) -> ChunkBatch:
         """Chunk content by lines with overlap.
 
         Args:
@@ -198,41 +421,27 @@ class FileIngestor:
             file_path: Path to the file (for metadata).
 
         Returns:
-            List of chunks.
+            The file's chunks.
         """
-        chunks = []
-
         if len(content) <= CHUNK_SIZE:
-            return [{
-                "id": "full",
-                "content": content,
-                "metadata": {"type": "full_file"},
-            }]
-
-        # Split into overlapping chunks
-        start = 0
-        chunk_num = 0
-        while start < len(content):
-            end = start + CHUNK_SIZE
-            chunk_content = content[start:end]
-
-            chunks.append({
-                "id": f"chunk_{chunk_num}",
-                "content": chunk_content,
-                "metadata": {
-                    "type": "chunk",
-                    "chunk_num": chunk_num,
-                    "start_char": start,
-                    "end_char": min(end, len(content)),
-                },
-            })
-
-            start += CHUNK_SIZE - CHUNK_OVERLAP
-            chunk_num += 1
-
-        return chunks
-
-    def _chunk_file(self, path: Path, content: str) -> list[dict]:
+            chunks = ChunkBatch()
+            chunks.append("full", content, chunk_type="full_file")
+            return chunks
+
+        # Split into overlapping chunks; window starts come straight from
+        # range() and slicing clamps the last window to the content length
+        length = len(content)
+        starts = list(range(0, length, CHUNK_SIZE - CHUNK_OVERLAP))
+        return ChunkBatch(
+            ids=[f"chunk_{chunk_num}" for chunk_num in range(len(starts))],
+            contents=[content[start:start + CHUNK_SIZE] for start in starts],
+            types=["chunk"] * len(starts),
+            names=[None] * len(starts),
+            starts=starts,
+            ends=[min(start + CHUNK_SIZE, length) for start in starts],
+        )
+
+    def _chunk_file(self, path: Path, content: str) -> ChunkBatch:
         """Chunk a file based on its language.
 
         Args:
@@ -240,7 +449,7 @@ class FileIngestor:
             content: File content.
 
         Returns:
-            List of chunks.
+            The file's chunks.
         """
         rel_path = self._get_relative_path(path)
         ext = path.suffix.lower()
@@ -253,78 +462,214 @@ class FileIngestor:
             # TODO: Add AST-based chunking for TypeScript, Go, etc.
             return self._chunk_by_lines(content, rel_path)
 
-    def index_file(self, path: Path, force: bool = False) -> int:
-        """Index a single file.
+    def _stat_unchanged(self, path: Path) -> bool:
+        """Check if a file has the mtime and size it was last hashed at."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        return self._stat_cache.get(self._get_relative_path(path)) == (st.st_mtime_ns, st.st_size)
+
+    def _prepare_file(self, path: Path, force: bool = False) -> PreparedFile | None:
+        """Read, hash and chunk a single file without touching the index.
+
+        Only reads shared state, so it is safe to run on worker threads.
 
         Args:
-            path: Path to the file to index.
-            force: If True, re-index even if unchanged.
+            path: Path to the file to prepare.
+            force: If True, prepare the file even if unchanged.
 
         Returns:
-            Number of chunks indexed.
+            The prepared file, or None if it is unchanged or unreadable.
+            A file whose stat changed but whose content did not comes back
+            with ``chunks=None`` so the caller can record the new stat.
         """
         rel_path = self._get_relative_path(path)
+        ext = path.suffix.lower()
+        language = SUPPORTED_EXTENSIONS.get(ext, "unknown")
+
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stat = (st.st_mtime_ns, st.st_size)
+
+        # Fast path: same mtime and size as when the hash was taken
+        if not force and self._stat_cache.get(rel_path) == stat:
+            return None
+        if time.time_ns() - st.st_mtime_ns < _RACY_WINDOW_NS:
+            stat = None
 
         # Check if file has changed
-        if not force:
-            current_hash = self._hash_file(path)
-            if self._hash_cache.get(rel_path) == current_hash:
-                return 0
-            self._hash_cache[rel_path] = current_hash
+        current_hash = self._hash_file(path)
+        if not force and self._hash_cache.get(rel_path) == current_hash:
+            if stat is None or self._stat_cache.get(rel_path) == stat:
+                return None
+            # Touched without edits
+            return PreparedFile(rel_path, current_hash, None, language, stat)
 
         try:
             content = path.read_text(encoding="utf-8", errors="replace")
         except (IOError, OSError):
-            return 0
+            return None
 
-        ext = path.suffix.lower()
-        language = SUPPORTED_EXTENSIONS.get(ext, "unknown")
+        return PreparedFile(
+            rel_path=rel_path,
+            content_hash=current_hash,
+            chunks=self._chunk_file(path, content),
+            language=language,
+            stat=stat,
+        )
+
+    def _iter_prepared(
+        self,
+        files: list[Path],
+        force: bool,
+        workers: int | None = None,
+    ) -> Generator[PreparedFile | None, None, None]:
+        """Prepare files in the background, yielding results in input order.
+
+        File reads, hashing and chunking overlap with whatever the consumer
+        does between results (embedding, Chroma writes). At most a few
+        files per worker are held in memory ahead of the consumer.
 
-        # Get chunks
-        chunks = self._chunk_file(path, content)
-
-        # Index each chunk
-        for chunk in chunks:
-            self.index.add_chunk(
-                file_path=rel_path,
-                chunk_id=chunk["id"],
-                content=chunk["content"],
-                metadata={
-                    "language": language,
-                    **chunk["metadata"],
-                },
+        Args:
+            files: Files to prepare.
+            force: If True, prepare files even if unchanged.
+            workers: None for a thread pool, 1 to prepare files inline, or
+                the number of worker processes to chunk on.
+        """
+        if workers == 1:
+            for path in files:
+                yield self._prepare_file(path, force)
+            return
+
+        executor: Executor
+        if workers is None:
+            workers = READ_WORKERS
+            executor = ThreadPoolExecutor(max_workers=workers)
+            prepare = self._prepare_file
+        else:
+            # Processes get past the GIL for parsing and chunking. Spawn
+            # rather than fork, since chromadb runs threads in this process
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self,),
             )
+            prepare = _prepare_file_worker
+
+        with executor:
+            pending: deque[Future] = deque()
+            for path in files:
+                pending.append(executor.submit(prepare, path, force))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _write_prepared(self, prepared: list[PreparedFile]) -> None:
+        """Index a batch of prepared files and record their hashes."""
+        if not prepared:
+            return
+        # Only changed (or forced) files get here, so the per-chunk lookup
+        # of stored hashes would be redundant; unchanged chunk texts are
+        # still served from the embedding caches
+        self.index.add_files_bulk(
+            [(p.rel_path, p.chunks, {"language": p.language}) for p in prepared],
+            skip_existence_check=True,
+        )
+        # Only remember hashes once the chunks are actually in the index
+        for p in prepared:
+            self._log_hash(p.rel_path, p.content_hash, p.stat)
+
+    def index_file(self, path: Path, force: bool = False) -> int:
+        """Index a single file.
+
+        Args:
+            path: Path to the file to index.
+            force: If True, re-index even if unchanged.
+
+        Returns:
+            Number of chunks indexed.
+        """
+        prepared = self._prepare_file(path, force=force)
+        if prepared is None:
+            return 0
+        if prepared.chunks is None:
+            self._log_hash(prepared.rel_path, prepared.content_hash, prepared.stat)
+            self._flush_hash_log()
+            return 0
 
-        return len(chunks)
+        self._write_prepared([prepared])
+        self._flush_hash_log()
+        return len(prepared.chunks)
 
     def index_all(
         self,
         force: bool = False,
         progress_callback=None,
+        workers: int | None = None,
     ) -> dict:
         """Index all code files in the repository.
 
+        Files are read and chunked in the background while this thread
+        embeds and writes them, so Chroma writes stay serialized. Chunks
+        are flushed to the index in batches spanning several files.
+
         Args:
             force: If True, re-index all files even if unchanged.
             progress_callback: Optional callback(file_path, current, total).
+            workers: Worker processes for reading and chunking; 1 does it
+                inline, None (the default) uses a thread pool. Processes
+                are only started once PROCESS_POOL_MIN_FILES files are left
+                after the stat fast path; fewer are prepared inline.
 
         Returns:
             Stats dict with files_scanned, files_indexed, chunks_total.
         """
         files = list(self.scan_files())
         total_files = len(files)
+        if not force:
+            # Files with the stat they were hashed at wouldn't be read anyway
+            files = [p for p in files if not self._stat_unchanged(p)]
+        if workers is not None and workers > 1 and len(files) < PROCESS_POOL_MIN_FILES:
+            workers = 1
         files_indexed = 0
         chunks_total = 0
 
-        for i, path in enumerate(files):
+        batch: list[PreparedFile] = []
+        batch_chunks = 0
+        batch_tokens = 0
+
+        results = self._iter_prepared(files, force, workers)
+        for i, (path, prepared) in enumerate(zip(files, results)):
             if progress_callback:
                 rel_path = self._get_relative_path(path)
-                progress_callback(rel_path, i + 1, total_files)
+                progress_callback(rel_path, i + 1, len(files))
+
+            if prepared is None:
+                continue
+            if not prepared.chunks:
+                # Touched but unchanged, or nothing to chunk: only the hash
+                # and stat need recording, so the file is skipped next run
+                self._log_hash(prepared.rel_path, prepared.content_hash, prepared.stat)
+                continue
+
+            files_indexed += 1
+            chunks_total += len(prepared.chunks)
+
+            batch.append(prepared)
+            batch_chunks += len(prepared.chunks)
+            batch_tokens += sum(map(len, prepared.chunks.contents)) // _CHARS_PER_TOKEN
+            if batch_chunks >= INDEX_BATCH_SIZE or batch_tokens >= INDEX_TOKEN_BUDGET:
+                self._write_prepared(batch)
+                batch = []
+                batch_chunks = 0
+                batch_tokens = 0
 
-            chunks = self.index_file(path, force=force)
-            if chunks > 0:
-                files_indexed += 1
-                chunks_total += chunks
+        self._write_prepared(batch)
 
         # Save the hash cache
         self._save_hash_cache()
@@ -352,7 +697,7 @@ class FileIngestor:
                 removed += 1
 
         for path in files_to_remove:
-            del self._hash_cache[path]
+            self._log_hash(path, None)
 
         if removed > 0:
             self._save_hash_cache()
@@ -0,0 +1,121 @@
+"""ONNX Runtime backend for sentence-transformers models.
+
+Enabled with ``GHOSTSTACK_EMBED_BACKEND=onnx``. The model is exported to
+ONNX and dynamically quantized to int8 once, then cached under
+the repository's ``.ghoststack/models/``. Requires the ``onnx`` extra.
+"""
+
+import os
+import shutil
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from ghoststack.core.config import ConfigManager
+
+if TYPE_CHECKING:
+    import numpy as np
+
+BACKEND_ENV = "GHOSTSTACK_EMBED_BACKEND"
+
+# Sequence length limit of all-MiniLM-L6-v2
+MAX_SEQ_LENGTH = 256
+
+QUANTIZED_FILE = "model_quantized.onnx"
+
+
+def use_onnx() -> bool:
+    """Check whether the ONNX backend was requested."""
+    return os.environ.get(BACKEND_ENV, "").lower() == "onnx"
+
+
+def _hub_id(model_name: str) -> str:
+    """Resolve a sentence-transformers short name to its Hugging Face id."""
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+def _export_quantized(model_id: str, out_dir: Path) -> None:
+    """Export a model to ONNX and quantize it to int8 in out_dir."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    export_dir = out_dir.with_name(f"{out_dir.name}.fp32")
+    try:
+        ORTModelForFeatureExtraction.from_pretrained(model_id, export=True).save_pretrained(
+            export_dir
+        )
+        AutoTokenizer.from_pretrained(model_id).save_pretrained(out_dir)
+
+        # Dynamic quantization needs no calibration data
+        quantizer = ORTQuantizer.from_pretrained(export_dir)
+        config = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=out_dir, quantization_config=config)
+    finally:
+        shutil.rmtree(export_dir, ignore_errors=True)
+
+
+class OnnxEmbedder:
+    """Drop-in replacement for SentenceTransformer.encode on ONNX Runtime."""
+
+    def __init__(self, model_name: str, models_dir: Path | None = None):
+        """Load the quantized model, exporting it on first use.
+
+        Args:
+            model_name: Name of the sentence-transformers model.
+            models_dir: Directory holding exported models, by default the
+                one ConfigManager keeps under the repository's GhostStack dir.
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        models_dir = models_dir or ConfigManager().models_dir
+        model_dir = models_dir / f"{model_name.replace('/', '__')}-int8"
+        if not (model_dir / QUANTIZED_FILE).exists():
+            _export_quantized(_hub_id(model_name), model_dir)
+
+        self._tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self._session = ort.InferenceSession(
+            str(model_dir / QUANTIZED_FILE), providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        dimension = self._session.get_outputs()[0].shape[-1]
+        self._dimension = dimension if isinstance(dimension, int) else 384
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Get the embedding dimension."""
+        return self._dimension
+
+    def encode(self, texts: list[str], batch_size: int = 32, **_kwargs) -> "np.ndarray":
+        """Embed texts as mean-pooled, L2-normalized vectors.
+
+        Accepts and ignores SentenceTransformer.encode's other keyword
+        arguments, so callers need not know which backend is loaded.
+        """
+        import numpy as np
+
+        # Batch texts of similar length together to minimise padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = np.empty((len(texts), self._dimension), dtype=np.float32)
+
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            encoded = self._tokenizer(
+                [texts[i] for i in idx],
+                padding=True,
+                truncation=True,
+                max_length=MAX_SEQ_LENGTH,
+                return_tensors="np",
+            )
+            feeds = {
+                name: value.astype(np.int64)
+                for name, value in encoded.items()
+                if name in self._input_names
+            }
+            hidden = self._session.run(None, feeds)[0]
+
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            out[idx] = pooled / np.clip(norms, 1e-12, None)
+
+        return out
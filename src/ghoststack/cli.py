@@ -82,13 +82,14 @@ def status() -> None:
     config_manager = ConfigManager()
     git = Git()
 
-    if not git.is_repo():
+    snapshot = git.snapshot()
+    if not snapshot.is_repo:
         print_error("Not a Git repository")
         raise typer.Exit(1)
 
     initialized = config_manager.is_initialized()
-    current_branch = git.get_current_branch()
-    is_dirty = git.is_dirty()
+    current_branch = snapshot.branch
+    is_dirty = snapshot.dirty
 
     status_data = {
         "initialized": initialized,
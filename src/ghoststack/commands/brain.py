@@ -1,13 +1,16 @@
 """Brain commands - Manage the code index."""
 
+import os
+import time
 from pathlib import Path
 from typing import Annotated
 
 import typer
-from rich.progress import Progress, SpinnerColumn, TextColumn
 
 from ghoststack.core.config import ConfigManager
 from ghoststack.core.git import Git
+from ghoststack.utils import jsonio
+from ghoststack.utils.fs import atomic_write_bytes
 from ghoststack.utils.output import (
     is_json_mode,
     print_error,
@@ -18,6 +21,9 @@ from ghoststack.utils.output import (
 
 app = typer.Typer(help="Manage the code intelligence index")
 
+# Seconds a cached document count is trusted while the index is unchanged
+STATUS_CACHE_TTL = 60.0
+
 
 def _require_init() -> ConfigManager:
     """Ensure GhostStack is initialized."""
@@ -28,12 +34,42 @@ def _require_init() -> ConfigManager:
     return config_manager
 
 
+def _index_mtime_ns(chroma_path: Path) -> int | None:
+    """Get the last modification time of Chroma's database, if it exists."""
+    mtimes = []
+    for name in ("chroma.sqlite3", "chroma.sqlite3-wal"):
+        try:
+            mtimes.append(os.stat(chroma_path / name).st_mtime_ns)
+        except OSError:
+            pass
+    return max(mtimes, default=None)
+
+
+def _load_cached_count(cache_file: Path, mtime_ns: int | None) -> int | None:
+    """Get the cached document count if it is fresh and the index is unchanged."""
+    if mtime_ns is None:
+        return None
+    try:
+        cached = jsonio.loads(cache_file.read_bytes())
+        if cached["chroma_mtime"] == mtime_ns and time.time() - cached["ts"] < STATUS_CACHE_TTL:
+            return cached["count"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
 @app.command("index")
 def index_command(
     force: Annotated[
         bool,
         typer.Option("--force", "-f", help="Re-index all files even if unchanged")
     ] = False,
+    workers: Annotated[
+        int,
+        typer.Option(
+            "--workers", "-w", min=1, help="Processes reading and chunking many changed files"
+        )
+    ] = os.cpu_count() or 4,
 ) -> None:
     """Index all code files in the repository.
 
@@ -41,10 +77,12 @@ def index_command(
     for semantic search. Only changed files are re-indexed unless --force.
 
     Example:
-        gs brain index         # Index changed files
-        gs brain index --force # Re-index everything
+        gs brain index              # Index changed files
+        gs brain index --force      # Re-index everything
+        gs brain index --workers 1  # Chunk files in this process
     """
     from ghoststack.brain import CodeIndex, FileIngestor
+    from ghoststack.core.related_cache import RelatedFilesCache
 
     config_manager = _require_init()
 
@@ -55,22 +93,20 @@ def index_command(
 
     # Initialize the index
     chroma_path = config_manager.ghoststack_dir / "chroma"
-    index = CodeIndex(chroma_path)
+    index = CodeIndex(
+        chroma_path, config_manager.embedding_cache_file, config_manager.models_dir
+    )
     ingestor = FileIngestor(Path.cwd(), index)
 
     print_info("Scanning repository for code files...")
 
     if is_json_mode():
         # Simple progress for JSON mode
-        stats = ingestor.index_all(force=force)
-        print_json({
-            "status": "success",
-            "files_scanned": stats["files_scanned"],
-            "files_indexed": stats["files_indexed"],
-            "chunks_total": stats["chunks_total"],
-        })
+        stats = ingestor.index_all(force=force, workers=workers)
     else:
         # Rich progress for terminal
+        from rich.progress import Progress, SpinnerColumn, TextColumn
+
         with Progress(
             SpinnerColumn(),
             TextColumn("[progress.description]{task.description}"),
@@ -87,8 +123,21 @@ def index_command(
             stats = ingestor.index_all(
                 force=force,
                 progress_callback=update_progress,
+                workers=workers,
             )
 
+    # Cached review lookups were computed against the old index
+    if stats["files_indexed"]:
+        RelatedFilesCache(config_manager.related_cache_file).bump_generation()
+
+    if is_json_mode():
+        print_json({
+            "status": "success",
+            "files_scanned": stats["files_scanned"],
+            "files_indexed": stats["files_indexed"],
+            "chunks_total": stats["chunks_total"],
+        })
+    else:
         print_success(
             "Indexing complete",
             {
@@ -108,8 +157,6 @@ def status_command() -> None:
     - Number of indexed documents
     - Index location
     """
-    from ghoststack.brain import CodeIndex
-
     config_manager = _require_init()
 
     chroma_path = config_manager.ghoststack_dir / "chroma"
@@ -127,12 +174,25 @@ def status_command() -> None:
             print_info("Run 'gs brain index' to create it")
         return
 
-    try:
-        index = CodeIndex(chroma_path)
-        count = index.count
-    except Exception as e:
-        print_error(f"Could not read index: {e}")
-        raise typer.Exit(1)
+    # Repeated calls (scripts, agent loops) skip opening Chroma
+    cache_file = config_manager.status_cache_file
+    count = _load_cached_count(cache_file, _index_mtime_ns(chroma_path))
+    if count is None:
+        from ghoststack.brain import CodeIndex
+
+        try:
+            index = CodeIndex(chroma_path)
+            count = index.count
+        except Exception as e:
+            print_error(f"Could not read index: {e}")
+            raise typer.Exit(1)
+
+        mtime_ns = _index_mtime_ns(chroma_path)
+        if mtime_ns is not None:
+            atomic_write_bytes(
+                cache_file,
+                jsonio.dumps({"count": count, "ts": time.time(), "chroma_mtime": mtime_ns}),
+            )
 
     if is_json_mode():
         print_json({
@@ -162,7 +222,8 @@ def clear_command(
     This removes all embeddings from the index. You'll need to
     run 'gs brain index' again to rebuild it.
     """
-    from ghoststack.brain import CodeIndex
+    from ghoststack.brain import CodeIndex, FileIngestor
+    from ghoststack.core.related_cache import RelatedFilesCache
 
     config_manager = _require_init()
     chroma_path = config_manager.ghoststack_dir / "chroma"
@@ -179,5 +240,8 @@ def clear_command(
 
     index = CodeIndex(chroma_path)
     index.clear()
+    FileIngestor(Path.cwd(), index).clear_hash_cache()
+    RelatedFilesCache(config_manager.related_cache_file).bump_generation()
+    config_manager.status_cache_file.unlink(missing_ok=True)
 
     print_success("Index cleared")
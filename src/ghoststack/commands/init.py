@@ -53,7 +53,9 @@ def init_command(
 
     if gitignore_path.exists():
         content = gitignore_path.read_text()
-        if ghoststack_entry not in content:
+        # Match whole rules; a substring test would also hit comments and longer paths
+        rules = {line.strip() for line in content.splitlines()}
+        if rules.isdisjoint({".ghoststack", ".ghoststack/", "/.ghoststack", "/.ghoststack/"}):
             with open(gitignore_path, "a") as f:
                 if not content.endswith("\n"):
                     f.write("\n")
@@ -1,5 +1,8 @@
 """Review command - AI-powered code review with semantic search."""
 
+import os
+import re
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Annotated, Optional
 
@@ -7,6 +10,8 @@ import typer
 
 from ghoststack.core.config import ConfigManager
 from ghoststack.core.git import Git, GitError
+from ghoststack.utils import jsonio
+from ghoststack.utils.fs import atomic_write_bytes
 from ghoststack.utils.output import (
     is_json_mode,
     print_error,
@@ -17,58 +22,175 @@ from ghoststack.utils.output import (
     print_warning,
 )
 
+# Maximum number of cached reviews
+REVIEW_CACHE_SIZE = 32
 
-def _get_diff_files(git: Git, base: str) -> list[dict]:
-    """Get list of changed files between current branch and base.
+# Maximum size of patch text read from git diff
+DIFF_MAX_BYTES = 200_000
+
+
+@dataclass
+class DiffFiles:
+    """Files changed in a diff, stored as parallel lists.
+
+    File ``i`` is ``paths[i]``, ``statuses[i]`` and so on, so totals over
+    large diffs are plain ``sum()`` calls instead of per-file dict lookups.
+    """
+
+    paths: list[str] = field(default_factory=list)
+    statuses: list[str | None] = field(default_factory=list)
+    # Source path of renames and copies
+    old_paths: list[str | None] = field(default_factory=list)
+    additions: list[int] = field(default_factory=list)
+    deletions: list[int] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def append(self, path: str) -> int:
+        """Add a file with no status or line counts yet, returning its row."""
+        self.paths.append(path)
+        self.statuses.append(None)
+        self.old_paths.append(None)
+        self.additions.append(0)
+        self.deletions.append(0)
+        return len(self.paths) - 1
+
+    @property
+    def total_changes(self) -> int:
+        """Get the number of added plus deleted lines."""
+        return sum(self.additions) + sum(self.deletions)
+
+    def as_list_of_dicts(self) -> list[dict]:
+        """Convert to one dict per file, as used in the review output."""
+        files = []
+        for i, path in enumerate(self.paths):
+            entry = {"path": path}
+            if self.old_paths[i] is not None:
+                entry["old_path"] = self.old_paths[i]
+            if self.statuses[i] is not None:
+                entry["status"] = self.statuses[i]
+            entry["additions"] = self.additions[i]
+            entry["deletions"] = self.deletions[i]
+            files.append(entry)
+        return files
+
+
+def _get_diff_files(git: Git, base: str) -> DiffFiles:
+    """Get the files changed between current branch and base.
 
     Returns:
-        List of dicts with path, status, additions, deletions.
+        The changed files with their status and line counts.
     """
+    # --raw gives the status and --numstat the line counts, both in one call;
+    # -z keeps paths with tabs or newlines intact
     result = git._run(
-        "diff", "--numstat", "--name-status", base, "HEAD",
+        "diff", "-z", "--raw", "--numstat", base, "HEAD",
         check=False,
     )
 
-    if not result.success:
-        return []
+    files = DiffFiles()
+    if not result.success or not result.stdout:
+        return files
 
-    files = []
-    lines = result.stdout.strip().split("\n") if result.stdout else []
+    tokens = result.stdout.split("\0")
+    rows: dict[str, int] = {}
+    i = 0
 
-    # Parse numstat output (additions, deletions, path)
-    for line in lines:
-        if not line.strip():
+    while i < len(tokens):
+        token = tokens[i]
+        i += 1
+        if not token:
             continue
-        parts = line.split("\t")
-        if len(parts) >= 3:
-            additions = int(parts[0]) if parts[0].isdigit() else 0
-            deletions = int(parts[1]) if parts[1].isdigit() else 0
-            path = parts[2]
-            files.append({
-                "path": path,
-                "additions": additions,
-                "deletions": deletions,
-            })
-        elif len(parts) >= 2:
-            # name-status format
-            status = parts[0]
-            path = parts[1]
-            files.append({
-                "path": path,
-                "status": status,
-            })
+
+        if token.startswith(":"):
+            # Raw record: ":<modes> <shas> <status>" then one or two paths
+            status = token.rsplit(" ", 1)[-1]
+            old_path = None
+            if status[:1] in ("R", "C"):
+                old_path = tokens[i]
+                i += 1
+            path = tokens[i]
+            i += 1
+            row = rows[path] = files.append(path)
+            files.statuses[row] = status
+            files.old_paths[row] = old_path
+            continue
+
+        # Numstat record: "<adds>\t<dels>\t<path>", where an empty path means
+        # the old and new paths of a rename follow
+        added, deleted, path = token.split("\t", 2)
+        if not path:
+            path = tokens[i + 1]
+            i += 2
+        row = rows.get(path)
+        if row is None:
+            row = rows[path] = files.append(path)
+        # Binary files report "-"
+        files.additions[row] = int(added) if added.isdigit() else 0
+        files.deletions[row] = int(deleted) if deleted.isdigit() else 0
 
     return files
 
 
-def _get_diff_content(git: Git, base: str, file_path: str) -> str:
-    """Get the diff content for a specific file."""
-    result = git._run("diff", base, "HEAD", "--", file_path, check=False)
-    return result.stdout if result.success else ""
+def _get_diff_contents(
+    git: Git,
+    base: str,
+    file_paths: list[str],
+    old_paths: list[str] | None = None,
+    max_bytes: int = DIFF_MAX_BYTES,
+) -> dict[str, str]:
+    """Get the diff content of several files with a single git call.
+
+    Args:
+        git: Git wrapper for the repository.
+        base: Ref to diff against.
+        file_paths: Files to get the diff of.
+        old_paths: Source paths of renamed files, so they diff as renames.
+        max_bytes: Size limit for the whole patch. Beyond it the patch is cut
+            off with a marker, and files past the cut are left out.
+
+    Returns:
+        Mapping of file path to its section of the patch.
+    """
+    if not file_paths:
+        return {}
+
+    # Plumbing-stable output whatever diff.* settings the user has
+    result, dropped = git._run_capped(
+        "diff", "--no-color", "--no-ext-diff", "--src-prefix=a/", "--dst-prefix=b/", "-M",
+        base, "HEAD", "--", *file_paths, *(old_paths or []),
+        max_bytes=max_bytes,
+    )
+    if not result.success:
+        return {}
+    patch = result.stdout
+    if dropped:
+        patch = f"{patch.rstrip()}\n... (diff truncated, {dropped} more bytes)"
+
+    wanted = set(file_paths)
+    contents: dict[str, str] = {}
+    for section in re.split(r"^(?=diff --git )", patch, flags=re.MULTILINE):
+        if not section:
+            continue
+        lines = section.split("\n")
+        # "diff --git a/<path> b/<path>": both halves match unless renamed
+        header = lines[0][len("diff --git "):]
+        path = header[(len(header) + 5) // 2:]
+        for line in lines[1:]:
+            if line.startswith(("rename to ", "copy to ")):
+                path = line.split(" to ", 1)[1]
+                break
+            if line.startswith(("---", "@@", "Binary")):
+                break
+        if path in wanted:
+            contents[path] = section.rstrip("\n")
+
+    return contents
 
 
 def _calculate_risk_level(
-    changed_files: list[dict],
+    changed_files: DiffFiles,
     related_files: list[dict],
 ) -> tuple[str, list[str]]:
     """Calculate the risk level of the changes.
@@ -80,7 +202,7 @@ def _calculate_risk_level(
     risk_score = 0
 
     # More changes = higher risk
-    total_changes = sum(f.get("additions", 0) + f.get("deletions", 0) for f in changed_files)
+    total_changes = changed_files.total_changes
     if total_changes > 500:
         risk_score += 2
         reasons.append(f"Large changeset ({total_changes} lines)")
@@ -111,6 +233,130 @@ def _calculate_risk_level(
         return "Low", reasons
 
 
+def _review_cache_file(git: Git, config_manager: ConfigManager, base: str) -> Path | None:
+    """Get the review cache file for the current base and HEAD commits."""
+    result = git._run("rev-parse", base, "HEAD", check=False)
+    shas = result.stdout.split()
+    if not result.success or len(shas) != 2:
+        return None
+    return config_manager.review_cache_dir / f"{shas[0]}_{shas[1]}.json"
+
+
+def _load_review(cache_file: Path | None, show_related: int, generation: int) -> dict | None:
+    """Load a cached review, if it was made with the same options and index."""
+    if cache_file is None:
+        return None
+    try:
+        cached = jsonio.loads(cache_file.read_bytes())
+    except (OSError, ValueError):
+        return None
+    if cached.get("related") != show_related or cached.get("generation") != generation:
+        return None
+    # Mark as recently used for eviction
+    os.utime(cache_file)
+    return cached["review"]
+
+
+def _save_review(
+    cache_file: Path | None,
+    review: dict,
+    show_related: int,
+    generation: int,
+) -> None:
+    """Cache a review, evicting the least recently used beyond the limit."""
+    if cache_file is None:
+        return
+    atomic_write_bytes(cache_file, jsonio.dumps({
+        "related": show_related,
+        "generation": generation,
+        "review": review,
+    }))
+
+    entries = sorted(cache_file.parent.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for stale in entries[:-REVIEW_CACHE_SIZE]:
+        stale.unlink(missing_ok=True)
+
+
+def _analyze_changes(
+    git: Git,
+    config_manager: ConfigManager,
+    base: str,
+    current_branch: str,
+    show_related: int,
+    verbose: bool,
+) -> dict:
+    """Diff against base, find related files and assess the risk.
+
+    Returns:
+        Dict with changed_files, related_files, risk_level, risk_reasons,
+        and cacheable (False if the index lookup failed).
+    """
+    # Get changed files
+    changed_files = _get_diff_files(git, base)
+    if not changed_files:
+        print_success("No changes detected")
+        if is_json_mode():
+            print_json({
+                "status": "success",
+                "message": "No changes detected",
+                "branch": current_branch,
+                "base": base,
+            })
+        raise typer.Exit(0)
+
+    # Load the code index
+    cacheable = True
+    chroma_path = config_manager.ghoststack_dir / "chroma"
+    if not chroma_path.exists():
+        print_warning("Code index not found. Run 'gs brain index' first.")
+        related_files = []
+    else:
+        # Deferred so reviews without an index never import the brain
+        from ghoststack.brain import CodeIndex
+        from ghoststack.core.related_cache import RelatedFilesCache
+
+        try:
+            changed_paths = changed_files.paths
+
+            # Reruns with the same changed files reuse the last lookup,
+            # unless the index was rebuilt since
+            query = "\n".join(sorted(changed_paths))
+            cache = RelatedFilesCache(config_manager.related_cache_file)
+            scope = f"related:{show_related}"
+            related_files = cache.get(query, scope)
+
+            if related_files is None:
+                index = CodeIndex(
+                    chroma_path, config_manager.embedding_cache_file, config_manager.models_dir
+                )
+                if index.count == 0:
+                    print_warning("Code index is empty. Run 'gs brain index' first.")
+                    related_files = []
+                else:
+                    # Find related files
+                    related_files = index.get_related_files(
+                        changed_paths,
+                        n_results=show_related,
+                    )
+                    cache.put(query, related_files, scope)
+        except Exception as e:
+            if verbose:
+                print_warning(f"Could not load index: {e}")
+            related_files = []
+            cacheable = False
+
+    # Calculate risk
+    risk_level, risk_reasons = _calculate_risk_level(changed_files, related_files)
+
+    return {
+        "changed_files": changed_files.as_list_of_dicts(),
+        "related_files": related_files,
+        "risk_level": risk_level,
+        "risk_reasons": risk_reasons,
+        "cacheable": cacheable,
+    }
+
+
 def review_command(
     base: Annotated[
         Optional[str],
@@ -136,7 +382,7 @@ def review_command(
         gs review              # Compare against parent branch
         gs review --base main  # Compare against main
     """
-    from ghoststack.brain import CodeIndex
+    from ghoststack.core.related_cache import RelatedFilesCache
 
     config_manager = ConfigManager()
     if not config_manager.is_initialized():
@@ -161,56 +407,42 @@ def review_command(
         if item and item.parent:
             base = item.parent
         else:
-            base = stack.base_branch
-            if not git.branch_exists(base):
-                # Try origin/main
-                result = git._run("rev-parse", "--verify", f"origin/{base}", check=False)
-                if result.success:
-                    base = f"origin/{base}"
-                else:
-                    print_error(f"Base branch '{base}' not found")
-                    raise typer.Exit(1)
+            # Fall back to e.g. origin/main if there is no local branch
+            resolved = git.resolve_branch(stack.base_branch)
+            if resolved is None:
+                print_error(f"Base branch '{stack.base_branch}' not found")
+                raise typer.Exit(1)
+            base = resolved
 
     print_info(f"Comparing {current_branch} → {base}")
 
-    # Get changed files
-    changed_files = _get_diff_files(git, base)
-    if not changed_files:
-        print_success("No changes detected")
-        if is_json_mode():
-            print_json({
-                "status": "success",
-                "message": "No changes detected",
-                "branch": current_branch,
-                "base": base,
-            })
-        raise typer.Exit(0)
-
-    # Load the code index
-    chroma_path = config_manager.ghoststack_dir / "chroma"
-    if not chroma_path.exists():
-        print_warning("Code index not found. Run 'gs brain index' first.")
-        related_files = []
-    else:
-        try:
-            index = CodeIndex(chroma_path)
-            if index.count == 0:
-                print_warning("Code index is empty. Run 'gs brain index' first.")
-                related_files = []
-            else:
-                # Find related files
-                changed_paths = [f["path"] for f in changed_files]
-                related_files = index.get_related_files(
-                    changed_paths,
-                    n_results=show_related,
-                )
-        except Exception as e:
-            if verbose:
-                print_warning(f"Could not load index: {e}")
-            related_files = []
-
-    # Calculate risk
-    risk_level, risk_reasons = _calculate_risk_level(changed_files, related_files)
+    # A review of the same two commits against the same index is reused
+    generation = RelatedFilesCache(config_manager.related_cache_file).generation
+    cache_file = _review_cache_file(git, config_manager, base)
+    review = _load_review(cache_file, show_related, generation)
+    if review is None:
+        review = _analyze_changes(
+            git, config_manager, base, current_branch, show_related, verbose
+        )
+        if review.pop("cacheable"):
+            _save_review(cache_file, review, show_related, generation)
+
+    changed_files = review["changed_files"]
+    related_files = review["related_files"]
+    risk_level = review["risk_level"]
+    risk_reasons = review["risk_reasons"]
+
+    # Patch text is only shown with --verbose, and is cheap next to the lookup
+    diffs = (
+        _get_diff_contents(
+            git,
+            base,
+            [f["path"] for f in changed_files],
+            [f["old_path"] for f in changed_files if "old_path" in f],
+        )
+        if verbose
+        else {}
+    )
 
     # Build output
     if is_json_mode():
@@ -229,6 +461,8 @@ def review_command(
                 for f in related_files
             ],
         }
+        if verbose:
+            output["diffs"] = diffs
         print_json(output)
     else:
         # Markdown output
@@ -278,4 +512,15 @@ def review_command(
             md_lines.append("")
             md_lines.append("No semantically related files found outside your changes.")
 
+        if diffs:
+            md_lines.append("")
+            md_lines.append("### 🔍 Diffs")
+            for path, patch in diffs.items():
+                md_lines.append("")
+                md_lines.append(f"#### `{path}`")
+                md_lines.append("")
+                md_lines.append("```diff")
+                md_lines.append(patch)
+                md_lines.append("```")
+
         print_markdown("\n".join(md_lines))
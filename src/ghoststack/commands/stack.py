@@ -4,7 +4,7 @@ from typing import Annotated, Optional
 
 import typer
 
-from ghoststack.core.config import ConfigManager
+from ghoststack.core.config import ConfigManager, StackState
 from ghoststack.core.git import Git, GitError
 from ghoststack.utils.output import (
     print_error,
@@ -26,7 +26,11 @@ def _require_init() -> tuple[ConfigManager, Git]:
         print_error("GhostStack not initialized. Run 'gs init' first.")
         raise typer.Exit(1)
 
-    git = Git()
+    try:
+        git = Git(stash_strategy=config_manager.load_config().stash_strategy)
+    except ValueError as e:
+        print_error(f"Invalid config: {e}")
+        raise typer.Exit(1)
     if not git.is_repo():
         print_error("Not a Git repository")
         raise typer.Exit(1)
@@ -96,7 +100,8 @@ def add_branch(
     config_manager, git = _require_init()
 
     # Determine parent branch
-    current_branch = git.get_current_branch()
+    snapshot = git.snapshot()
+    current_branch = snapshot.branch
     if current_branch is None:
         print_error("Cannot stack from detached HEAD state")
         raise typer.Exit(1)
@@ -109,11 +114,14 @@ def add_branch(
         raise typer.Exit(1)
 
     # Check for dirty tree
-    if git.is_dirty():
+    if snapshot.dirty:
         print_warning("Working tree has uncommitted changes")
         print_info("Auto-stashing changes...")
-        stashed = True
-        git.stash_push("GhostStack: auto-stash before stack add")
+        try:
+            stashed = git.stash_push("GhostStack: auto-stash before stack add")
+        except GitError as e:
+            print_error("Failed to stash changes", {"error": str(e)})
+            raise typer.Exit(1)
     else:
         stashed = False
 
@@ -122,9 +130,10 @@ def add_branch(
         git.create_branch(name, checkout=True)
 
         # Update stack state
-        stack = config_manager.load_stack()
-        stack.add_item(name=name, parent=parent_branch)
-        config_manager.save_stack(stack)
+        with config_manager.batch():
+            stack = config_manager.load_stack()
+            stack.add_item(name=name, parent=parent_branch)
+            config_manager.save_stack(stack)
 
         print_success(
             f"Created branch '{name}'",
@@ -145,7 +154,49 @@ def add_branch(
             try:
                 git.stash_pop()
             except GitError:
-                print_warning("Could not restore stash automatically. Run 'git stash pop' manually.")
+                if git.stash_strategy == "patch":
+                    restore = f"git apply --index {git.pending_stash()}"
+                else:
+                    restore = "git stash pop"
+                print_warning(f"Could not restore stash automatically. Run '{restore}' manually.")
+
+
+def _find_sync_conflicts(
+    git: Git, stack: StackState, current_branch: str, target_branch: str, update_refs: bool
+) -> dict[str, list[str]]:
+    """Map each branch that would conflict with the target to its conflicted paths.
+
+    Only branches the rebase rewrites are checked: the current branch, and
+    with --update-refs the stack branches in its history. Those already
+    containing the target are skipped; the rest are merged with it in
+    memory by a single git merge-tree, which conflicts where the rebase
+    would in all but unusual histories. If the check itself fails (e.g.
+    git is too old for merge-tree --stdin), it warns and reports nothing.
+    """
+    others: list[str] = []
+    if update_refs:
+        names = [item.name for item in stack.items if item.name != current_branch]
+        exists = git.branches_exist(names)
+        others = [name for name in names if exists[name]]
+    try:
+        shas = git.resolve_commits([target_branch, current_branch, *others])
+        # A branch is in the current branch's history if it is its own merge base
+        bases = git.merge_bases([(branch, current_branch) for branch in others])
+        branches = [
+            current_branch,
+            *(branch for branch, base in zip(others, bases) if base == shas[branch]),
+        ]
+        bases = git.merge_bases([(target_branch, branch) for branch in branches])
+        behind = [branch for branch, base in zip(branches, bases) if base != shas[target_branch]]
+        results = git.dry_merge_batch([(target_branch, branch) for branch in behind])
+    except GitError as e:
+        print_warning(f"Could not check for conflicts, rebasing anyway: {e}")
+        return {}
+    return {
+        branch: result.conflicts
+        for branch, result in zip(behind, results)
+        if not result.clean
+    }
 
 
 @app.command("sync")
@@ -158,11 +209,17 @@ def sync_stack(
         bool,
         typer.Option("--update-refs/--no-update-refs", help="Use git rebase --update-refs")
     ] = True,
+    check: Annotated[
+        bool,
+        typer.Option("--check/--no-check", help="Look for conflicts before rebasing")
+    ] = True,
 ) -> None:
     """Sync (rebase) the current stack onto the base branch.
 
     This command uses `git rebase --update-refs` to efficiently
     rebase the entire stack while maintaining branch pointers.
+    Each branch is first merged with the target in memory, and the sync
+    stops before rebasing if any of them would conflict.
 
     Example:
         gs stack sync              # Rebase onto default base (main)
@@ -174,16 +231,30 @@ def sync_stack(
     target_branch = target or stack.base_branch
 
     # Check for dirty tree
-    if git.is_dirty():
+    snapshot = git.snapshot()
+    if snapshot.dirty:
         print_error("Working tree has uncommitted changes")
         print_info("Please commit or stash your changes before syncing")
         raise typer.Exit(1)
 
-    current_branch = git.get_current_branch()
+    current_branch = snapshot.branch
     if current_branch is None:
         print_error("Cannot sync from detached HEAD state")
         raise typer.Exit(1)
 
+    if check:
+        conflicts = _find_sync_conflicts(
+            git, stack, current_branch, target_branch, update_refs
+        )
+        if conflicts:
+            if is_json_mode():
+                details = {"conflicts": conflicts}
+            else:
+                details = {branch: ", ".join(paths) for branch, paths in conflicts.items()}
+            print_error("Syncing would likely conflict", details)
+            print_info("Resolve the conflicts first, or run with --no-check to rebase anyway")
+            raise typer.Exit(1)
+
     print_info(f"Syncing stack onto '{target_branch}'...")
 
     try:
@@ -253,6 +324,7 @@ def remove_branch(
 
         try:
             git._run("branch", "-D", name)
+            git.invalidate_cache()
             print_success(f"Removed and deleted branch '{name}'")
         except GitError as e:
             print_warning(f"Removed from stack, but failed to delete Git branch: {e}")
@@ -1,13 +1,29 @@
 """GhostStack configuration management."""
 
-import json
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
 from dataclasses import asdict, dataclass, field
 from pathlib import Path
 from typing import Any
 
+from ghoststack.utils import jsonio
+from ghoststack.utils.fs import atomic_write_bytes
+
+try:
+    import fcntl
+except ImportError:  # Windows: writes stay atomic, just unlocked
+    fcntl = None
+
 GHOSTSTACK_DIR = ".ghoststack"
 CONFIG_FILE = "config.json"
 STACK_FILE = "stack.json"
+EMBEDDING_CACHE_FILE = "embeddings.db"
+RELATED_CACHE_FILE = "related_cache.json"
+STATUS_CACHE_FILE = "status_cache.json"
+REVIEW_CACHE_DIR = "review_cache"
+MODELS_DIR = "models"
+LOCK_FILE = "config.lock"
 
 
 @dataclass
@@ -17,6 +33,8 @@ class GhostStackConfig:
     version: str = "1.0"
     default_base: str = "main"
     auto_stash: bool = True
+    # "stash" (git stash) or "patch" (a saved diff; faster on large repos)
+    stash_strategy: str = "stash"
     json_output: bool = False
 
     def to_dict(self) -> dict[str, Any]:
@@ -49,10 +67,36 @@ class StackItem:
 
 @dataclass
 class StackState:
-    """The full stack state."""
+    """The full stack state.
+
+    Items are indexed by name and by parent, so lookups don't scan the
+    stack; change ``items`` through add_item/remove_item to keep the
+    indexes current.
+    """
 
     items: list[StackItem] = field(default_factory=list)
     base_branch: str = "main"
+    _by_name: dict[str, StackItem] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _children: dict[str | None, list[StackItem]] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        self._reindex()
+
+    def _reindex(self) -> None:
+        """Rebuild the name and parent indexes from items."""
+        self._by_name = {}
+        self._children = {}
+        for item in self.items:
+            self._index(item)
+
+    def _index(self, item: StackItem) -> None:
+        """Add an item to the indexes; the first item with a name wins."""
+        self._by_name.setdefault(item.name, item)
+        self._children.setdefault(item.parent, []).append(item)
 
     def to_dict(self) -> dict[str, Any]:
         """Convert to dictionary."""
@@ -79,26 +123,27 @@ class StackState:
             created_at=datetime.now(timezone.utc).isoformat(),
         )
         self.items.append(item)
+        self._index(item)
         return item
 
     def remove_item(self, name: str) -> bool:
         """Remove an item from the stack."""
-        for i, item in enumerate(self.items):
-            if item.name == name:
-                self.items.pop(i)
-                return True
-        return False
+        item = self._by_name.get(name)
+        if item is None:
+            return False
+        self.items.remove(item)
+        # Rare enough not to maintain incrementally, and keeps duplicate
+        # names resolving to the next item
+        self._reindex()
+        return True
 
     def get_item(self, name: str) -> StackItem | None:
         """Get an item by name."""
-        for item in self.items:
-            if item.name == name:
-                return item
-        return None
+        return self._by_name.get(name)
 
     def get_children(self, name: str) -> list[StackItem]:
         """Get all items that have the given name as parent."""
-        return [item for item in self.items if item.parent == name]
+        return list(self._children.get(name, ()))
 
 
 class ConfigManager:
@@ -108,6 +153,11 @@ class ConfigManager:
         """Initialize config manager for the given repository path."""
         self.repo_path = repo_path or Path.cwd()
         self.ghoststack_dir = self.repo_path / GHOSTSTACK_DIR
+        self._lock_fd: int | None = None
+        self._lock_depth = 0
+        self._batch_depth = 0
+        # Path -> data of saves deferred by batch()
+        self._pending: dict[Path, dict[str, Any]] = {}
 
     @property
     def config_file(self) -> Path:
@@ -119,6 +169,85 @@ class ConfigManager:
         """Path to the stack state file."""
         return self.ghoststack_dir / STACK_FILE
 
+    @property
+    def embedding_cache_file(self) -> Path:
+        """Path to the persistent embedding cache."""
+        return self.ghoststack_dir / EMBEDDING_CACHE_FILE
+
+    @property
+    def models_dir(self) -> Path:
+        """Path to the directory of exported embedding models."""
+        return self.ghoststack_dir / MODELS_DIR
+
+    @property
+    def related_cache_file(self) -> Path:
+        """Path to the cache of recent related-file lookups."""
+        return self.ghoststack_dir / RELATED_CACHE_FILE
+
+    @property
+    def status_cache_file(self) -> Path:
+        """Path to the cached index document count."""
+        return self.ghoststack_dir / STATUS_CACHE_FILE
+
+    @property
+    def review_cache_dir(self) -> Path:
+        """Directory of cached reviews, one file per pair of commits."""
+        return self.ghoststack_dir / REVIEW_CACHE_DIR
+
+    @property
+    def lock_file(self) -> Path:
+        """Path to the lock serializing writes between gs processes."""
+        return self.ghoststack_dir / LOCK_FILE
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        """Hold an exclusive lock on the GhostStack state (re-entrant)."""
+        if self._lock_depth == 0 and fcntl is not None and self.ghoststack_dir.is_dir():
+            self._lock_fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0 and self._lock_fd is not None:
+                # Closing the descriptor releases the lock
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    @contextmanager
+    def batch(self) -> Iterator["ConfigManager"]:
+        """Group loads and saves into one locked, coalesced update.
+
+        Other gs processes cannot write in between, so read-modify-write
+        sequences don't lose updates. Saves inside the block are deferred
+        and each file is written once on exit; loads see deferred saves.
+        """
+        with self._lock():
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    pending, self._pending = self._pending, {}
+                    for path, data in pending.items():
+                        atomic_write_bytes(path, jsonio.dumps(data, indent=True))
+
+    def _read_json(self, path: Path) -> dict[str, Any]:
+        """Read a state file, preferring a save deferred by batch()."""
+        if path in self._pending:
+            return jsonio.loads(jsonio.dumps(self._pending[path]))
+        return jsonio.loads(path.read_bytes())
+
+    def _write_json(self, path: Path, data: dict[str, Any]) -> None:
+        """Write a state file atomically, or defer it inside batch()."""
+        if self._batch_depth:
+            self._pending[path] = data
+            return
+        with self._lock():
+            atomic_write_bytes(path, jsonio.dumps(data, indent=True))
+
     def is_initialized(self) -> bool:
         """Check if GhostStack is initialized in this repo."""
         return self.config_file.exists()
@@ -128,33 +257,30 @@ class ConfigManager:
         self.ghoststack_dir.mkdir(exist_ok=True)
 
         config = config or GhostStackConfig()
-        self.save_config(config)
+        with self.batch():
+            self.save_config(config)
 
-        # Initialize empty stack
-        self.save_stack(StackState(base_branch=config.default_base))
+            # Initialize empty stack
+            self.save_stack(StackState(base_branch=config.default_base))
 
         return config
 
     def load_config(self) -> GhostStackConfig:
         """Load configuration from file."""
-        if not self.config_file.exists():
+        if self.config_file not in self._pending and not self.config_file.exists():
             raise FileNotFoundError("GhostStack not initialized. Run 'gs init' first.")
-        with open(self.config_file) as f:
-            return GhostStackConfig.from_dict(json.load(f))
+        return GhostStackConfig.from_dict(self._read_json(self.config_file))
 
     def save_config(self, config: GhostStackConfig) -> None:
         """Save configuration to file."""
-        with open(self.config_file, "w") as f:
-            json.dump(config.to_dict(), f, indent=2)
+        self._write_json(self.config_file, config.to_dict())
 
     def load_stack(self) -> StackState:
         """Load stack state from file."""
-        if not self.stack_file.exists():
+        if self.stack_file not in self._pending and not self.stack_file.exists():
             return StackState()
-        with open(self.stack_file) as f:
-            return StackState.from_dict(json.load(f))
+        return StackState.from_dict(self._read_json(self.stack_file))
 
     def save_stack(self, stack: StackState) -> None:
         """Save stack state to file."""
-        with open(self.stack_file, "w") as f:
-            json.dump(stack.to_dict(), f, indent=2)
+        self._write_json(self.stack_file, stack.to_dict())
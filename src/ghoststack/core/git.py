@@ -1,13 +1,65 @@
-"""Safe Git wrapper with auto-stash and error handling."""
+"""Safe Git wrapper with auto-stash and error handling.
 
+Read-only queries go through pygit2 (libgit2) in-process when it is
+installed (the ``fast`` extra), and through the git CLI otherwise.
+"""
+
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
 from contextlib import contextmanager
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Generator
+from typing import TYPE_CHECKING, Any, Generator
 
+from ghoststack.utils import jsonio
+from ghoststack.utils.fs import atomic_write_bytes
 
-@dataclass
+if TYPE_CHECKING:
+    import pygit2
+
+# Resolved once, so spawning doesn't walk PATH each time. An absolute path
+# with close_fds=False also lets subprocess use posix_spawn (vfork) instead
+# of fork, which matters once the brain has grown the process
+_GIT = shutil.which("git") or "git"
+
+# How stash_push/stash_pop save changes: "stash" uses git stash, "patch"
+# saves a binary diff under the git dir, which only touches changed files
+STASH_STRATEGIES = ("stash", "patch")
+
+# Directory in the git dir holding patches saved by the "patch" strategy
+PATCH_STASH_DIR = "ghoststack-stash"
+
+# File in the git dir recording the stash made by stash_push until stash_pop
+# restores it, so changes stashed by an interrupted run aren't forgotten
+STATE_FILE = "ghoststack/state.json"
+
+
+@contextmanager
+def _kill_after(proc: subprocess.Popen, seconds: float) -> Iterator[threading.Event]:
+    """Kill proc if the block is still running after seconds.
+
+    Blocking reads from a pipe can't time out by themselves, so a timer
+    kills git instead; the yielded event tells whether it did.
+    """
+    expired = threading.Event()
+
+    def expire() -> None:
+        expired.set()
+        proc.kill()
+
+    timer = threading.Timer(seconds, expire)
+    timer.start()
+    try:
+        yield expired
+    finally:
+        timer.cancel()
+
+
+@dataclass(slots=True, frozen=True)
 class GitResult:
     """Result of a Git command execution."""
 
@@ -22,6 +74,24 @@ class GitResult:
         return self.stdout if self.success else self.stderr
 
 
+@dataclass
+class MergeResult:
+    """Outcome of merging two commits without touching the working tree."""
+
+    clean: bool
+    tree: str
+    conflicts: list[str] = field(default_factory=list)
+
+
+@dataclass
+class GitStatus:
+    """Repository state gathered by a single Git command."""
+
+    is_repo: bool
+    branch: str | None
+    dirty: bool
+
+
 class GitError(Exception):
     """Exception raised when a Git command fails."""
 
@@ -30,28 +100,173 @@ class GitError(Exception):
         self.result = result
 
 
+class _CatFileBatch:
+    """Long-running ``git cat-file`` process for object lookups.
+
+    Each lookup is a line written to its stdin and a line read back, instead
+    of a new git process per query. Lookups are pipelined: a whole window is
+    written at once, and with ``--batch-command --buffer`` (Git 2.36+) git
+    answers it with one write after the "flush" command rather than one per
+    lookup. Older Git falls back to ``--batch-check``.
+    """
+
+    FORMAT = "%(objectname) %(objecttype)"
+
+    # Lookups written before reading their answers back; small enough that
+    # the answers fit in the pipe buffer, so neither side blocks on the other
+    WINDOW = 256
+
+    def __init__(self, repo_path: Path):
+        self.repo_path = repo_path
+        self._proc: subprocess.Popen | None = None
+        self._batch_command = True
+
+    def resolve(self, rev: str) -> str | None:
+        """Get the object name rev resolves to, or None if it doesn't exist."""
+        return self.resolve_many([rev])[0]
+
+    def resolve_many(self, revs: list[str]) -> list[str | None]:
+        """Resolve several revs, writing them in windows rather than one at a time."""
+        names: list[str | None] = []
+        for start in range(0, len(revs), self.WINDOW):
+            names.extend(self._resolve_window(revs[start:start + self.WINDOW]))
+        return names
+
+    def _resolve_window(self, revs: list[str]) -> list[str | None]:
+        """Write a window of lookups, then read back one answer per lookup."""
+        if self._proc is None or self._proc.poll() is not None:
+            if self._batch_command:
+                mode = [f"--batch-command={self.FORMAT}", "--buffer"]
+            else:
+                mode = [f"--batch-check={self.FORMAT}"]
+            try:
+                self._proc = subprocess.Popen(
+                    [_GIT, "-C", str(self.repo_path), "cat-file", *mode],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                    close_fds=False,
+                )
+            except FileNotFoundError as e:
+                raise GitError("Git is not installed or not in PATH") from e
+
+        if self._batch_command:
+            request = "".join(f"info {rev}\n" for rev in revs) + "flush\n"
+        else:
+            request = "".join(f"{rev}\n" for rev in revs)
+        try:
+            self._proc.stdin.write(request)
+            self._proc.stdin.flush()
+            lines = [self._proc.stdout.readline() for _ in revs]
+        except BrokenPipeError:
+            lines = [""]
+        if not all(lines):
+            self.close()
+            if self._batch_command:
+                # Git before 2.36 rejects --batch-command
+                self._batch_command = False
+                return self._resolve_window(revs)
+            raise GitError("git cat-file exited while resolving refs")
+
+        names: list[str | None] = []
+        for line in lines:
+            # "<objectname> <objecttype>", or "<rev> missing" / "<rev> ambiguous"
+            name, _, kind = line.rstrip("\n").rpartition(" ")
+            names.append(None if kind in ("missing", "ambiguous") else name)
+        return names
+
+    def close(self) -> None:
+        """Stop the process; the next lookup starts a new one."""
+        if self._proc is not None:
+            if self._proc.poll() is None:
+                self._proc.stdin.close()
+                self._proc.wait()
+            self._proc.stdout.close()
+            self._proc = None
+
+
+def _normalize_config_key(key: str) -> str:
+    """Normalize a config key the way ``git config --list`` prints it.
+
+    Section and variable names are case-insensitive, subsection names are not.
+    """
+    section, _, rest = key.partition(".")
+    subsection, _, variable = rest.rpartition(".")
+    if not subsection:
+        return f"{section.lower()}.{variable.lower()}"
+    return f"{section.lower()}.{subsection}.{variable.lower()}"
+
+
 class Git:
     """Safe Git wrapper with auto-stash protection."""
 
-    def __init__(self, repo_path: Path | None = None):
-        """Initialize Git wrapper for the given repository path."""
+    def __init__(self, repo_path: Path | None = None, stash_strategy: str = "stash"):
+        """Initialize Git wrapper for the given repository path.
+
+        Args:
+            repo_path: Path to the repository, the current directory by default.
+            stash_strategy: How auto-stash saves changes, one of STASH_STRATEGIES.
+        """
+        if stash_strategy not in STASH_STRATEGIES:
+            raise ValueError(f"Unsupported stash strategy: {stash_strategy!r}")
+
         self.repo_path = repo_path or Path.cwd()
+        # Shared start of every git command line
+        self._argv_prefix = (_GIT, "-C", str(self.repo_path))
+        self.stash_strategy = stash_strategy
+        # Whether this object stashed changes it hasn't restored yet
         self._stash_created = False
+        # Contents of STATE_FILE, loaded on first use
+        self._state: dict[str, Any] | None = None
+        # Results of read-only queries, cleared by commands that move HEAD or refs
+        self._cache: dict[tuple[str, ...], Any] = {}
+        self._cat_file = _CatFileBatch(self.repo_path)
+        self._libgit2_repo: pygit2.Repository | None = None
+        self._libgit2_checked = False
+
+    def close(self) -> None:
+        """Stop the helper processes kept for repeated queries."""
+        self._cat_file.close()
+
+    def __del__(self) -> None:
+        # __init__ may have raised before the helper existed
+        if hasattr(self, "_cat_file"):
+            self.close()
+
+    def _memo(self, key: tuple[str, ...], compute: Callable[[], Any]) -> Any:
+        """Return a cached query result, computing it on first use."""
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def invalidate_cache(self) -> None:
+        """Forget cached query results.
 
-    def _run(self, *args: str, check: bool = True) -> GitResult:
-        """Run a Git command and return the result."""
-        cmd = ["git", "-C", str(self.repo_path), *args]
+        Called by every method that changes HEAD, refs or the stash; call it
+        after changing the repository behind this object's back (e.g. with
+        another git process) so later queries see the changes.
+        """
+        self._cache.clear()
+        # Restarted on next use, so lookups see the new refs and objects
+        self._cat_file.close()
+
+    def _run(self, *args: str, check: bool = True, input: bytes | None = None) -> GitResult:
+        """Run a Git command and return the result, feeding it input on stdin."""
+        cmd = [*self._argv_prefix, *args]
         try:
+            # Bytes are decoded directly, skipping the universal-newlines layer
             result = subprocess.run(
                 cmd,
+                input=input,
                 capture_output=True,
-                text=True,
                 timeout=30,
+                close_fds=False,
             )
             git_result = GitResult(
                 success=result.returncode == 0,
-                stdout=result.stdout.strip(),
-                stderr=result.stderr.strip(),
+                stdout=result.stdout.decode("utf-8", "replace").strip(),
+                stderr=result.stderr.decode("utf-8", "replace").strip(),
                 returncode=result.returncode,
             )
             if check and not git_result.success:
@@ -62,35 +277,271 @@ class Git:
         except FileNotFoundError as e:
             raise GitError("Git is not installed or not in PATH") from e
 
+    def _run_capped(self, *args: str, max_bytes: int) -> tuple[GitResult, int]:
+        """Run a Git command, keeping at most max_bytes of its output.
+
+        The rest of the output is read and discarded as it arrives, so memory
+        stays bounded however large the output is.
+
+        Returns:
+            The result, and the number of bytes of output that were dropped.
+        """
+        cmd = [*self._argv_prefix, *args]
+        try:
+            # stderr goes to a file so a chatty command can't block on a full pipe
+            with tempfile.TemporaryFile() as err:
+                proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, close_fds=False)
+                with _kill_after(proc, 30) as timed_out, proc:
+                    kept = proc.stdout.read(max_bytes)
+                    dropped = 0
+                    while chunk := proc.stdout.read(65536):
+                        dropped += len(chunk)
+                    returncode = proc.wait()
+                err.seek(0)
+                stderr = err.read()
+        except FileNotFoundError as e:
+            raise GitError("Git is not installed or not in PATH") from e
+        if timed_out.is_set():
+            raise GitError(f"Git command timed out: {' '.join(args)}")
+
+        result = GitResult(
+            success=returncode == 0,
+            # The cut may fall inside a multi-byte character
+            stdout=kept.decode("utf-8", errors="replace"),
+            stderr=stderr.decode("utf-8", errors="replace").strip(),
+            returncode=returncode,
+        )
+        return result, dropped
+
+    def _run_stream(self, *args: str) -> Iterator[str]:
+        """Run a Git command, yielding its output one line at a time.
+
+        Lines are decoded as git writes them, so the whole output is never
+        held at once. The 30 second limit covers the whole run, reads
+        included, so a stalled git can't block forever. Abandoning the
+        iterator kills git.
+
+        Raises:
+            GitError: If the command times out, or fails once its output
+                is exhausted.
+        """
+        cmd = [*self._argv_prefix, *args]
+        # stderr goes to a file so a chatty command can't block on a full pipe
+        err = tempfile.TemporaryFile()
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                stdout=subprocess.PIPE,
+                stderr=err,
+                close_fds=False,
+                encoding="utf-8",
+                errors="replace",
+            )
+        except FileNotFoundError as e:
+            err.close()
+            raise GitError("Git is not installed or not in PATH") from e
+
+        with err, _kill_after(proc, 30) as timed_out, proc:
+            try:
+                for line in proc.stdout:
+                    yield line.rstrip("\n")
+            finally:
+                if proc.poll() is None:
+                    proc.kill()
+            returncode = proc.wait()
+            err.seek(0)
+            stderr = err.read().decode("utf-8", "replace").strip()
+
+        if timed_out.is_set():
+            raise GitError(f"Git command timed out: {' '.join(args)}")
+        if returncode != 0:
+            result = GitResult(success=False, stdout="", stderr=stderr, returncode=returncode)
+            raise GitError(f"Git command failed: {' '.join(args)}", result)
+
+    def _libgit2(self) -> "pygit2.Repository | None":
+        """Open the repository in-process, or None if pygit2 or libgit2 can't.
+
+        Opened once; libgit2 re-reads refs, config and the index as they
+        change on disk, so the handle stays valid across mutations.
+        """
+        if not self._libgit2_checked:
+            self._libgit2_checked = True
+            try:
+                import pygit2
+            except ImportError:
+                return None
+            try:
+                path = pygit2.discover_repository(str(self.repo_path))
+                if path is not None:
+                    self._libgit2_repo = pygit2.Repository(path)
+            except (pygit2.GitError, ValueError):
+                # Something libgit2 can't read (e.g. a sha256 repository);
+                # the git CLI paths still can
+                self._libgit2_repo = None
+        return self._libgit2_repo
+
     def is_repo(self) -> bool:
         """Check if the current directory is a Git repository."""
-        result = self._run("rev-parse", "--git-dir", check=False)
-        return result.success
+        def compute() -> bool:
+            if self._libgit2() is not None:
+                return True
+            return self._run("rev-parse", "--git-dir", check=False).success
+
+        return self._memo(("is_repo",), compute)
+
+    def snapshot(self) -> GitStatus:
+        """Check is_repo, get_current_branch and is_dirty in one go.
+
+        ``git status --branch`` reports all three, so this is one process
+        rather than three. Also fills the is_repo and current branch caches.
+        """
+        if self._libgit2() is not None:
+            return GitStatus(is_repo=True, branch=self.get_current_branch(), dirty=self.is_dirty())
+
+        result = self._run("status", "--porcelain=v2", "--branch", check=False)
+        if not result.success:
+            return GitStatus(is_repo=False, branch=None, dirty=False)
+
+        branch = None
+        dirty = False
+        for line in result.stdout.split("\n"):
+            if line.startswith("# branch.head "):
+                head = line[len("# branch.head "):]
+                branch = None if head == "(detached)" else head
+            elif line and not line.startswith("#"):
+                dirty = True
+                break
+
+        self._cache[("is_repo",)] = True
+        self._cache[("current_branch",)] = branch
+        return GitStatus(is_repo=True, branch=branch, dirty=dirty)
 
     def is_dirty(self) -> bool:
         """Check if the working tree has uncommitted changes."""
-        result = self._run("status", "--porcelain", check=False)
-        return bool(result.stdout)
+        repo = self._libgit2()
+        if repo is not None:
+            # Ignored files are left out, as with git status
+            return bool(repo.status())
+        if self.is_dirty_tracked():
+            return True
+        # Untracked directories are listed as a whole, and the first path is enough
+        return self._first_byte(
+            "ls-files", "--others", "--exclude-standard", "--directory", "--no-empty-directory"
+        )
+
+    def is_dirty_tracked(self) -> bool:
+        """Check if tracked files have uncommitted changes, ignoring untracked ones.
+
+        Cheaper than is_dirty, as untracked files aren't searched for.
+        """
+        repo = self._libgit2()
+        if repo is not None:
+            return bool(repo.status(untracked_files="no"))
+        # Stat-only changes would count as modifications, so refresh them away;
+        # diff-index --quiet then stops at the first real difference
+        self._run("update-index", "-q", "--refresh", check=False)
+        result = self._run("diff-index", "--quiet", "HEAD", "--", check=False)
+        if result.returncode in (0, 1):
+            return result.returncode == 1
+        # No HEAD yet, so anything in the index is a change
+        return bool(self._run("ls-files", check=False).stdout)
+
+    def _first_byte(self, *args: str) -> bool:
+        """Check whether a Git command prints anything, stopping it once it does.
+
+        Used where any output at all is the answer, so git needn't format
+        (and we needn't read) the rest of it. A failed command prints nothing.
+        """
+        cmd = [*self._argv_prefix, *args]
+        try:
+            proc = subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, close_fds=False
+            )
+        except FileNotFoundError as e:
+            raise GitError("Git is not installed or not in PATH") from e
+
+        with _kill_after(proc, 30) as timed_out, proc:
+            first = proc.stdout.read(1)
+            if proc.poll() is None:
+                proc.kill()
+        if timed_out.is_set() and not first:
+            raise GitError(f"Git command timed out: {' '.join(args)}")
+        return bool(first)
 
     def get_current_branch(self) -> str | None:
         """Get the current branch name, or None if in detached HEAD state."""
-        result = self._run("symbolic-ref", "--short", "HEAD", check=False)
-        return result.stdout if result.success else None
+        def compute() -> str | None:
+            repo = self._libgit2()
+            if repo is not None:
+                # Read HEAD itself, so an unborn branch still has a name
+                target = repo.references["HEAD"].target
+                if isinstance(target, str) and target.startswith("refs/heads/"):
+                    return target[len("refs/heads/"):]
+                return None
+            result = self._run("symbolic-ref", "--short", "HEAD", check=False)
+            return result.stdout if result.success else None
+
+        return self._memo(("current_branch",), compute)
+
+    def _branch_refs(self) -> tuple[str, ...]:
+        """Get the full refnames of all local branches, read once."""
+        def compute() -> tuple[str, ...]:
+            # Full names, as %(refname:short) turns into "heads/<name>" when
+            # a tag or remote ref has the same name
+            lines = self._run_stream("for-each-ref", "--format=%(refname)", "refs/heads/")
+            return tuple(ref for ref in lines if ref)
+
+        return self._memo(("branch_refs",), compute)
 
     def get_all_branches(self) -> list[str]:
         """Get list of all local branches."""
-        result = self._run("branch", "--format=%(refname:short)")
-        return [b for b in result.stdout.split("\n") if b]
+        return [ref[len("refs/heads/"):] for ref in self._branch_refs()]
 
     def branch_exists(self, name: str) -> bool:
-        """Check if a branch exists."""
-        result = self._run("show-ref", "--verify", f"refs/heads/{name}", check=False)
-        return result.success
+        """Check if a branch exists.
+
+        Answered from the branch list once it has been loaded, otherwise by
+        a single ref lookup; use branches_exist for many names.
+        """
+        if ("branch_refs",) in self._cache:
+            return self.branches_exist([name])[name]
+        repo = self._libgit2()
+        if repo is not None:
+            return self._memo(("branch_exists", name), lambda: name in repo.branches.local)
+        return self._memo(
+            ("branch_exists", name),
+            lambda: self._cat_file.resolve(f"refs/heads/{name}") is not None,
+        )
+
+    def branches_exist(self, names: Iterable[str]) -> dict[str, bool]:
+        """Check which of several branches exist, with one git call for all of them."""
+        refs = self._memo(("branch_ref_set",), lambda: set(self._branch_refs()))
+        return {name: f"refs/heads/{name}" in refs for name in names}
+
+    def resolve_branch(self, name: str, remote: str = "origin") -> str | None:
+        """Resolve a branch name to a local branch, or its remote-tracking branch.
+
+        Both refs are probed with a single command.
+
+        Returns:
+            name if the local branch exists, else "<remote>/<name>" if the
+            remote-tracking branch does, else None.
+        """
+        local, tracking = f"refs/heads/{name}", f"refs/remotes/{remote}/{name}"
+        result = self._run("for-each-ref", "--format=%(refname)", local, tracking, check=False)
+        # Patterns also match refs below them (e.g. refs/heads/<name>/x), so compare exactly
+        refs = set(result.stdout.split("\n"))
+        if local in refs:
+            return name
+        if tracking in refs:
+            return f"{remote}/{name}"
+        return None
 
     def create_branch(self, name: str, checkout: bool = True) -> None:
         """Create a new branch, optionally checking it out."""
         if self.branch_exists(name):
             raise GitError(f"Branch '{name}' already exists")
+        self.invalidate_cache()
         if checkout:
             self._run("checkout", "-b", name)
         else:
@@ -98,6 +549,7 @@ class Git:
 
     def checkout(self, ref: str) -> None:
         """Checkout a branch or commit."""
+        self.invalidate_cache()
         self._run("checkout", ref)
 
     def get_merge_base(self, branch1: str, branch2: str) -> str:
@@ -105,31 +557,275 @@ class Git:
         result = self._run("merge-base", branch1, branch2)
         return result.stdout
 
+    def resolve_commits(self, revs: Iterable[str]) -> dict[str, str]:
+        """Resolve revs to commit IDs in one pass through the cat-file helper.
+
+        Raises:
+            GitError: If a rev doesn't name a commit.
+        """
+        revs = list(dict.fromkeys(revs))
+        shas = dict(zip(revs, self._cat_file.resolve_many([f"{r}^{{commit}}" for r in revs])))
+        missing = [rev for rev, sha in shas.items() if sha is None]
+        if missing:
+            raise GitError(f"Unknown revision: {', '.join(missing)}")
+        return shas
+
+    def merge_bases(self, pairs: list[tuple[str, str]]) -> list[str]:
+        """Get the merge base of each pair of revs.
+
+        All revs are resolved in one pass through the cat-file helper;
+        git merge-base then runs once per distinct pair of differing
+        commits, and not at all for pairs that point at the same commit.
+
+        Raises:
+            GitError: If a rev doesn't exist or a pair has no merge base.
+        """
+        shas = self.resolve_commits(rev for pair in pairs for rev in pair)
+        bases = []
+        for rev1, rev2 in pairs:
+            sha1, sha2 = shas[rev1], shas[rev2]
+            if sha1 == sha2:
+                bases.append(sha1)
+                continue
+            bases.append(self._memo(
+                ("merge_base", *sorted((sha1, sha2))),
+                lambda: self._run("merge-base", sha1, sha2).stdout,
+            ))
+        return bases
+
+    def dry_merge_batch(self, pairs: list[tuple[str, str]]) -> list[MergeResult]:
+        """Merge each pair of revs in memory and report conflicts.
+
+        Runs one ``git merge-tree --stdin`` for all pairs; neither the
+        working tree, the index nor any ref is touched.
+
+        Raises:
+            GitError: If a rev doesn't exist or a merge can't be attempted.
+        """
+        if not pairs:
+            return []
+        # Resolved up front, as merge-tree would abort the whole batch on
+        # the first unknown rev
+        shas = self.resolve_commits(rev for pair in pairs for rev in pair)
+        stdin = "".join(f"{shas[rev1]} {shas[rev2]}\n" for rev1, rev2 in pairs)
+        try:
+            proc = subprocess.run(
+                [*self._argv_prefix, "merge-tree", "--stdin", "--name-only"],
+                input=stdin,
+                capture_output=True,
+                text=True,
+                timeout=30 + len(pairs),
+                close_fds=False,
+            )
+        except subprocess.TimeoutExpired as e:
+            raise GitError("Git command timed out: merge-tree --stdin") from e
+        except FileNotFoundError as e:
+            raise GitError("Git is not installed or not in PATH") from e
+        if proc.returncode != 0:
+            raise GitError(
+                "Git command failed: merge-tree --stdin",
+                GitResult(False, proc.stdout, proc.stderr.strip(), proc.returncode),
+            )
+
+        # Per merge: "<1 clean|0 conflicted>\0<tree>\0", then if conflicted the
+        # conflicted paths, "\0", and messages as "<n>\0<n paths>\0<type>\0<text>\0";
+        # every merge ends with "\0"
+        tokens = iter(proc.stdout.split("\0"))
+        results = []
+        for status in tokens:
+            if len(results) == len(pairs):
+                break
+            result = MergeResult(clean=status == "1", tree=next(tokens))
+            if not result.clean:
+                paths = iter(lambda: next(tokens), "")
+                result.conflicts = list(dict.fromkeys(paths))
+                for count in iter(lambda: next(tokens), ""):
+                    for _ in range(int(count) + 2):
+                        next(tokens)
+            else:
+                next(tokens)
+            results.append(result)
+        return results
+
     def rebase(self, target: str, update_refs: bool = False) -> None:
         """Rebase the current branch onto target."""
         args = ["rebase"]
         if update_refs:
             args.append("--update-refs")
         args.append(target)
+        self.invalidate_cache()
         self._run(*args)
 
-    def stash_push(self, message: str = "GhostStack auto-stash") -> bool:
-        """Stash changes. Returns True if a stash was created."""
-        if not self.is_dirty():
+    def _git_dir(self) -> Path:
+        """Get the absolute path of the git dir."""
+        git_dir = self._memo(
+            ("git_dir",), lambda: self._run("rev-parse", "--absolute-git-dir").stdout
+        )
+        return Path(git_dir)
+
+    def _patch_stash_dir(self) -> Path:
+        """Get the directory of patches saved by the "patch" stash strategy."""
+        return self._git_dir() / PATCH_STASH_DIR
+
+    def _load_state(self) -> dict[str, Any]:
+        """Get the contents of STATE_FILE, reading it once."""
+        if self._state is None:
+            try:
+                self._state = jsonio.loads((self._git_dir() / STATE_FILE).read_bytes())
+            except (OSError, ValueError):
+                self._state = {}
+        return self._state
+
+    def _save_state(self, state: dict[str, Any]) -> None:
+        """Replace the contents of STATE_FILE atomically."""
+        atomic_write_bytes(self._git_dir() / STATE_FILE, jsonio.dumps(state))
+        self._state = state
+
+    def clear_state(self) -> None:
+        """Forget the recorded stash, e.g. after restoring it by hand."""
+        (self._git_dir() / STATE_FILE).unlink(missing_ok=True)
+        self._state = {}
+        self._stash_created = False
+
+    def pending_stash(self) -> str | None:
+        """Get the stash recorded by stash_push and not yet restored, if any.
+
+        That is the stash commit with the "stash" strategy, or the path of the
+        patch file with the "patch" strategy. A record whose stash no longer exists is
+        stale (the changes were restored some other way) and is cleared.
+        """
+        state = self._load_state()
+        ref = state.get("stash_ref")
+        if not state.get("stashed") or not ref:
+            return None
+        if state.get("strategy") == "patch":
+            ref = str(self._patch_stash_dir() / ref)
+            exists = Path(ref).is_file()
+        else:
+            stashes = self._run("stash", "list", "--format=%H", check=False).stdout
+            exists = ref in stashes.split("\n")
+        if not exists:
+            self.clear_state()
+            return None
+        return ref
+
+    def stash_push(
+        self, message: str = "GhostStack auto-stash", include_untracked: bool = False
+    ) -> bool:
+        """Stash changes. Returns True if a stash was created.
+
+        Untracked files are left in place unless include_untracked is set, so
+        when they are the only changes nothing is stashed at all. With the
+        "patch" strategy, message is not recorded.
+
+        The stash is recorded in STATE_FILE until stash_pop restores it. The
+        record is only consulted when there is something to stash, so a clean
+        tree costs a single probe.
+
+        Raises:
+            GitError: If a recorded stash was never restored, so the changes
+                of an interrupted run aren't buried under new ones.
+        """
+        dirty = self.is_dirty() if include_untracked else self.is_dirty_tracked()
+        if not dirty:
+            return False
+        pending = self.pending_stash()
+        if pending is not None:
+            raise GitError(
+                f"Changes stashed by an interrupted operation were never restored ({pending}). "
+                "Restore or drop them, then run again"
+            )
+        self.invalidate_cache()
+        if self.stash_strategy == "stash":
+            args = ["stash", "push", "-m", message]
+            if include_untracked:
+                args.append("--include-untracked")
+            # git stash succeeds without creating an entry if it finds nothing
+            # to save, so check whether the stash ref moved
+            before = self._stash_head()
+            self._run(*args)
+            after = self._stash_head()
+            if after == before:
+                return False
+            self._record_stash(after)
+            return True
+
+        if include_untracked:
+            # Intent-to-add entries show up in the diff as new files, and the
+            # reset below then removes them from the working tree
+            self._run("add", "--intent-to-add", "--", ":/")
+        stash_dir = self._patch_stash_dir()
+        stash_dir.mkdir(exist_ok=True)
+        patch = stash_dir / f"{time.time_ns()}.patch"
+        # Plumbing, so diff.noprefix, color.diff and the like can't change
+        # the format; stat-only changes are refreshed away first
+        self._run("update-index", "-q", "--refresh", check=False)
+        self._run("diff-index", "-p", "--binary", f"--output={patch}", "HEAD")
+        if not patch.stat().st_size:
+            # Changes can cancel out against HEAD, e.g. an edit and its revert
+            patch.unlink()
             return False
-        self._run("stash", "push", "-m", message)
+        # The working tree is HEAD plus the patch, so the patch must reverse
+        # cleanly onto it; if not, restoring it would fail, so keep the changes
+        check = self._run("apply", "--check", "--reverse", str(patch), check=False)
+        if not check.success:
+            patch.unlink()
+            raise GitError("Could not save changes as a patch", check)
+        self._record_stash(patch.name)
+        # Resetting touches only the files whose stat changed
+        self._run("reset", "--hard", "--quiet", "HEAD")
         return True
 
+    def _record_stash(self, ref: str) -> None:
+        """Record a stash in STATE_FILE before anything else can go wrong."""
+        self._save_state({"stashed": True, "stash_ref": ref, "strategy": self.stash_strategy})
+        self._stash_created = True
+
+    def _stash_head(self) -> str | None:
+        """Get the commit of the most recent stash entry, if any."""
+        result = self._run("rev-parse", "--verify", "--quiet", "refs/stash", check=False)
+        return result.stdout if result.success else None
+
+    def has_stash(self) -> bool:
+        """Check if there is a stash entry, with a single ref lookup."""
+        return self._stash_head() is not None
+
     def stash_pop(self) -> None:
-        """Pop the most recent stash."""
-        self._run("stash", "pop")
+        """Pop the most recent stash.
+
+        With the "patch" strategy, restored changes come back staged. The
+        patch recorded by stash_push is restored, or the newest one if there
+        is no record. If it doesn't apply, it is kept and GitError is raised.
+        """
+        self.invalidate_cache()
+        if self.stash_strategy == "stash":
+            self._run("stash", "pop")
+        else:
+            state = self._load_state()
+            if state.get("stashed") and state.get("strategy") == "patch":
+                patch = self._patch_stash_dir() / state["stash_ref"]
+            else:
+                patches = sorted(
+                    self._patch_stash_dir().glob("*.patch"), key=lambda p: int(p.stem)
+                )
+                if not patches:
+                    raise GitError("No stashed patch to restore")
+                patch = patches[-1]
+            self._run("apply", "--index", str(patch))
+            patch.unlink()
+        self.clear_state()
 
     @contextmanager
     def auto_stash(self) -> Generator[bool, None, None]:
         """Context manager that auto-stashes and restores changes.
 
-        Yields True if a stash was created, False otherwise.
+        Yields True if a stash was created, False otherwise. Nested inside
+        another auto_stash that stashed, the tree is already clean, so it
+        yields False without checking.
         """
+        if self._stash_created:
+            yield False
+            return
         stashed = self.stash_push()
         try:
             yield stashed
@@ -138,9 +834,33 @@ class Git:
                 self.stash_pop()
 
     def get_config(self, key: str) -> str | None:
-        """Get a Git config value."""
-        result = self._run("config", "--get", key, check=False)
-        return result.stdout if result.success else None
+        """Get a Git config value.
+
+        The whole configuration is read once and answered from memory.
+        """
+        repo = self._libgit2()
+        if repo is not None:
+            try:
+                return repo.config[key]
+            except KeyError:
+                return None
+        return self._memo(("config",), self._load_config).get(_normalize_config_key(key))
+
+    def _load_config(self) -> dict[str, str]:
+        """Read every config value; for multi-valued keys the last one wins."""
+        result = self._run("config", "--list", "--null", check=False)
+        config = {}
+        # Entries are "<key>\n<value>\0", or just "<key>\0" for a bare boolean
+        for entry in result.stdout.split("\0"):
+            if entry:
+                key, _, value = entry.partition("\n")
+                config[key] = value
+        return config
+
+    def _forget_config(self) -> None:
+        """Drop cached results derived from Git config."""
+        for key in [k for k in self._cache if k[0] in ("config", "remote_url")]:
+            del self._cache[key]
 
     def set_config(self, key: str, value: str, local: bool = True) -> None:
         """Set a Git config value."""
@@ -148,9 +868,49 @@ class Git:
         if local:
             args.append("--local")
         args.extend([key, value])
+        self._forget_config()
         self._run(*args)
 
+    def set_configs(self, values: dict[str, str], local: bool = True) -> None:
+        """Set several Git config values.
+
+        Written in-process with pygit2 when installed; git config takes one
+        key per call, so otherwise each value costs a process.
+        """
+        self._forget_config()
+        repo = self._libgit2()
+        if repo is not None:
+            # Like git config, writes go to the repository's own config file
+            for key, value in values.items():
+                repo.config[key] = value
+            return
+        for key, value in values.items():
+            self.set_config(key, value, local=local)
+
+    def add(self, paths: list[str]) -> None:
+        """Stage files with a single git add, however many there are.
+
+        Paths go over stdin rather than the command line, so no argument
+        length limit applies, and are taken literally rather than as globs.
+        """
+        if not paths:
+            return
+        self._run(
+            "--literal-pathspecs",
+            "add",
+            "--pathspec-from-file=-",
+            "--pathspec-file-nul",
+            input="\0".join(paths).encode("utf-8"),
+        )
+
     def get_remote_url(self, remote: str = "origin") -> str | None:
-        """Get the URL of a remote."""
-        result = self._run("remote", "get-url", remote, check=False)
-        return result.stdout if result.success else None
+        """Get the URL of a remote.
+
+        Memoized like the other queries; call invalidate_cache after changing
+        remotes with another git process.
+        """
+        def compute() -> str | None:
+            result = self._run("remote", "get-url", remote, check=False)
+            return result.stdout if result.success else None
+
+        return self._memo(("remote_url", remote), compute)
@@ -0,0 +1,117 @@
+"""Persistent cache of recent related-file lookups made by ``gs review``."""
+
+import hashlib
+import time
+from pathlib import Path
+from typing import Any
+
+from ghoststack.utils import jsonio
+from ghoststack.utils.fs import atomic_write_bytes
+
+# Maximum number of cached lookups
+RELATED_CACHE_SIZE = 200
+
+# Seconds a cached lookup stays valid
+RELATED_CACHE_TTL = 300.0
+
+
+def _digest(key: str, scope: str) -> str:
+    """Identify a lookup in the cache file."""
+    return hashlib.blake2b(f"{scope}\0{key}".encode(), digest_size=16).hexdigest()
+
+
+class RelatedFilesCache:
+    """Map of changed files -> related files found for them, oldest first.
+
+    Every ``gs`` invocation is a new process, so entries live in a small
+    JSON file rather than in memory. Lookups are exact: a result is only
+    served for the same set of files in the same scope, within the TTL, and
+    from the current generation. Bumping the generation (e.g. after
+    re-indexing) invalidates them all, and the review cache is keyed on the
+    generation too.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_entries: int = RELATED_CACHE_SIZE,
+        ttl: float = RELATED_CACHE_TTL,
+    ):
+        """Load the cache.
+
+        Args:
+            path: Path to the cache file.
+            max_entries: Maximum number of cached lookups.
+            ttl: Seconds a cached lookup stays valid.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = self._load()
+        self._generation = self._data["generation"]
+
+    def _load(self) -> dict[str, Any]:
+        """Read the cache file, dropping expired entries."""
+        try:
+            data = jsonio.loads(self.path.read_bytes())
+            entries = data["entries"]
+            generation = data["generation"]
+            cutoff = time.time() - self.ttl
+            entries = {k: e for k, e in entries.items() if e["ts"] >= cutoff}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return {"generation": 0, "entries": {}}
+        return {"generation": generation, "entries": entries}
+
+    def _save(self) -> None:
+        """Write the cache file atomically."""
+        atomic_write_bytes(self.path, jsonio.dumps(self._data))
+
+    @property
+    def generation(self) -> int:
+        """Get the generation the cache was loaded at."""
+        return self._generation
+
+    def get(self, key: str, scope: str = "") -> Any | None:
+        """Find the cached result of a lookup.
+
+        Args:
+            key: The lookup, i.e. the sorted paths it is about.
+            scope: Only match queries cached with the same scope.
+
+        Returns:
+            The cached result, or None on a miss.
+        """
+        entry = self._data["entries"].get(_digest(key, scope))
+        return None if entry is None else entry["value"]
+
+    def put(self, key: str, value: Any, scope: str = "") -> None:
+        """Cache the result of a lookup.
+
+        Dropped if the generation was bumped since this cache was loaded,
+        as the result may have been computed from outdated data.
+
+        Args:
+            key: The lookup, as passed to get.
+            value: JSON-serializable result.
+            scope: Scope the result is valid for.
+        """
+        # Merge with entries cached by other processes in the meantime
+        self._data = self._load()
+        if self._data["generation"] != self._generation:
+            return
+
+        entries = self._data["entries"]
+        digest = _digest(key, scope)
+        # Re-inserted at the end, so it is evicted last
+        entries.pop(digest, None)
+        entries[digest] = {"value": value, "ts": time.time()}
+        for old in list(entries)[:-self.max_entries]:
+            del entries[old]
+        self._save()
+
+    def bump_generation(self) -> None:
+        """Invalidate every cached result."""
+        generation = self._load()["generation"] + 1
+        self._data = {"generation": generation, "entries": {}}
+        self._generation = generation
+        self._save()
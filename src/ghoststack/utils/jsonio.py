@@ -0,0 +1,37 @@
+"""JSON encoding, using orjson when it is installed."""
+
+import json
+from collections.abc import Callable
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # Optional; install the "fast" extra
+    orjson = None
+
+
+def dumps(data: Any, indent: bool = False, default: Callable[[Any], Any] | None = None) -> bytes:
+    """Serialize data to UTF-8 encoded JSON.
+
+    Args:
+        data: JSON-serializable data.
+        indent: Pretty-print with two-space indentation.
+        default: Called to convert objects JSON can't serialize.
+    """
+    if orjson is not None:
+        # Accept non-string keys like the stdlib encoder does
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, default=default, option=option)
+    text = json.dumps(data, indent=2 if indent else None, default=default, ensure_ascii=False)
+    return text.encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    """Parse JSON.
+
+    Raises:
+        ValueError: If data is not valid JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
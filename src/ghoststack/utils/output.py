@@ -1,19 +1,41 @@
 """Output utilities for agent-friendly formatting."""
 
-import json
-from typing import Any
+import sys
+from typing import TYPE_CHECKING, Any
 
-from rich.console import Console
-from rich.markdown import Markdown
-from rich.panel import Panel
+from ghoststack.utils import jsonio
 
-console = Console()
-error_console = Console(stderr=True)
+if TYPE_CHECKING:
+    from rich.console import Console
+
+# Created on first use, so JSON runs never import Rich
+_stdout_console: "Console | None" = None
+_stderr_console: "Console | None" = None
 
 # Global flag for JSON output mode
 _json_mode = False
 
 
+def _console() -> "Console":
+    """Get the console for regular output."""
+    global _stdout_console
+    if _stdout_console is None:
+        from rich.console import Console
+
+        _stdout_console = Console()
+    return _stdout_console
+
+
+def _error_console() -> "Console":
+    """Get the console for errors, writing to stderr."""
+    global _stderr_console
+    if _stderr_console is None:
+        from rich.console import Console
+
+        _stderr_console = Console(stderr=True)
+    return _stderr_console
+
+
 def set_json_mode(enabled: bool) -> None:
     """Enable or disable JSON output mode."""
     global _json_mode
@@ -26,8 +48,12 @@ def is_json_mode() -> bool:
 
 
 def print_json(data: Any) -> None:
-    """Print data as formatted JSON."""
-    console.print(json.dumps(data, indent=2, default=str))
+    """Print data as formatted JSON.
+
+    Written straight to stdout: Rich would only add markup parsing and
+    highlighting that machine-readable output must not have.
+    """
+    sys.stdout.write(jsonio.dumps(data, indent=True, default=str).decode("utf-8") + "\n")
 
 
 def print_markdown(content: str) -> None:
@@ -35,7 +61,17 @@ def print_markdown(content: str) -> None:
     if _json_mode:
         print_json({"markdown": content})
     else:
-        console.print(Markdown(content))
+        # The Markdown parser is a heavy import that JSON runs never need
+        from rich.markdown import Markdown
+
+        _console().print(Markdown(content))
+
+
+def _with_details(line: str, details: dict[str, Any] | None) -> str:
+    """Append one indented line per detail, so a message prints in one go."""
+    if not details:
+        return line
+    return "\n".join([line, *(f"  [dim]{key}:[/] {value}" for key, value in details.items())])
 
 
 def print_success(message: str, details: dict[str, Any] | None = None) -> None:
@@ -43,10 +79,7 @@ def print_success(message: str, details: dict[str, Any] | None = None) -> None:
     if _json_mode:
         print_json({"status": "success", "message": message, **(details or {})})
     else:
-        console.print(f"[bold green]✓[/] {message}")
-        if details:
-            for key, value in details.items():
-                console.print(f"  [dim]{key}:[/] {value}")
+        _console().print(_with_details(f"[bold green]✓[/] {message}", details))
 
 
 def print_error(message: str, details: dict[str, Any] | None = None) -> None:
@@ -54,10 +87,7 @@ def print_error(message: str, details: dict[str, Any] | None = None) -> None:
     if _json_mode:
         print_json({"status": "error", "message": message, **(details or {})})
     else:
-        error_console.print(f"[bold red]✗[/] {message}")
-        if details:
-            for key, value in details.items():
-                error_console.print(f"  [dim]{key}:[/] {value}")
+        _error_console().print(_with_details(f"[bold red]✗[/] {message}", details))
 
 
 def print_warning(message: str) -> None:
@@ -65,7 +95,7 @@ def print_warning(message: str) -> None:
     if _json_mode:
         print_json({"status": "warning", "message": message})
     else:
-        console.print(f"[bold yellow]⚠[/] {message}")
+        _console().print(f"[bold yellow]⚠[/] {message}")
 
 
 def print_info(message: str) -> None:
@@ -73,7 +103,7 @@ def print_info(message: str) -> None:
     if _json_mode:
         print_json({"status": "info", "message": message})
     else:
-        console.print(f"[bold blue]ℹ[/] {message}")
+        _console().print(f"[bold blue]ℹ[/] {message}")
 
 
 def print_stack_tree(stack: list[dict[str, Any]]) -> None:
@@ -83,13 +113,18 @@ def print_stack_tree(stack: list[dict[str, Any]]) -> None:
         return
 
     if not stack:
-        console.print("[dim]No branches in stack[/]")
+        _console().print("[dim]No branches in stack[/]")
         return
 
-    console.print(Panel("[bold]📚 GhostStack[/]", expand=False))
+    from rich.console import Group
+    from rich.panel import Panel
+
+    # Rendered and written in one print, however long the stack
+    lines = []
     for i, item in enumerate(stack):
         prefix = "└──" if i == len(stack) - 1 else "├──"
         current = " [bold cyan]← current[/]" if item.get("current") else ""
-        console.print(f"  {prefix} [bold]{item['name']}[/]{current}")
+        lines.append(f"  {prefix} [bold]{item['name']}[/]{current}")
         if item.get("parent"):
-            console.print(f"      [dim]↳ parent: {item['parent']}[/]")
+            lines.append(f"      [dim]↳ parent: {item['parent']}[/]")
+    _console().print(Group(Panel("[bold]📚 GhostStack[/]", expand=False), "\n".join(lines)))
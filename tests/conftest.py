@@ -0,0 +1,59 @@
+"""Shared fixtures: throwaway Git repositories."""
+
+import subprocess
+import sys
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _git_identity(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Give git a committer and keep the user's config out of the tests."""
+    monkeypatch.setenv("GIT_AUTHOR_NAME", "Test")
+    monkeypatch.setenv("GIT_AUTHOR_EMAIL", "test@example.com")
+    monkeypatch.setenv("GIT_COMMITTER_NAME", "Test")
+    monkeypatch.setenv("GIT_COMMITTER_EMAIL", "test@example.com")
+    monkeypatch.setenv("GIT_CONFIG_GLOBAL", str(tmp_path / "gitconfig"))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+
+
+@pytest.fixture(params=["pygit2", "cli"])
+def backend(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> str:
+    """Run a test with pygit2 (when installed) and with the git CLI alone."""
+    if request.param == "pygit2":
+        pytest.importorskip("pygit2")
+    else:
+        monkeypatch.setitem(sys.modules, "pygit2", None)
+    return request.param
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    """A repository on main with one commit of a tracked file "a"."""
+    path = tmp_path / "repo"
+    path.mkdir()
+    git = make_runner(path)
+    git("init", "-q", "-b", "main")
+    (path / "a").write_text("a\n")
+    git("add", "a")
+    git("commit", "-q", "-m", "initial")
+    return path
+
+
+def make_runner(path: Path) -> Callable[..., str]:
+    """Get a function running git in path and returning its stdout."""
+    def run(*args: str) -> str:
+        result = subprocess.run(
+            ["git", "-C", str(path), *args], check=True, capture_output=True, text=True
+        )
+        return result.stdout.strip()
+
+    return run
+
+
+@pytest.fixture
+def run(repo: Path) -> Callable[..., str]:
+    """Run git in the repo fixture."""
+    return make_runner(repo)
@@ -0,0 +1,50 @@
+"""Tests for the stack state and its indexes."""
+
+from ghoststack.core.config import StackItem, StackState
+
+
+def stack() -> StackState:
+    """main <- a <- b, and main <- c."""
+    state = StackState()
+    state.add_item("a", "main")
+    state.add_item("b", "a")
+    state.add_item("c", "main")
+    return state
+
+
+def names(items: list[StackItem]) -> list[str]:
+    return [item.name for item in items]
+
+
+def test_indexes() -> None:
+    state = stack()
+    assert state.get_item("b").parent == "a"
+    assert state.get_item("nope") is None
+    assert names(state.get_children("main")) == ["a", "c"]
+    assert state.get_children("b") == []
+
+
+def test_remove_item_rebuilds_indexes() -> None:
+    state = stack()
+    assert state.remove_item("a") is True
+    assert state.get_item("a") is None
+    assert names(state.get_children("main")) == ["c"]
+    # b keeps its parent; it is just no longer in the stack
+    assert names(state.get_children("a")) == ["b"]
+    assert state.remove_item("a") is False
+
+
+def test_remove_duplicate_resolves_to_the_next() -> None:
+    state = StackState(items=[StackItem("x", "main"), StackItem("x", "other")])
+    assert state.get_item("x").parent == "main"
+    state.remove_item("x")
+    assert state.get_item("x").parent == "other"
+    assert state.get_children("main") == []
+    assert names(state.get_children("other")) == ["x"]
+
+
+def test_round_trip() -> None:
+    state = stack()
+    loaded = StackState.from_dict(state.to_dict())
+    assert loaded == state
+    assert names(loaded.get_children("main")) == ["a", "c"]
@@ -0,0 +1,245 @@
+"""Tests for the Git wrapper, against temporary repositories."""
+
+import subprocess
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from ghoststack.core import git as git_module
+from ghoststack.core.git import STATE_FILE, Git, GitError, _CatFileBatch
+
+
+@pytest.mark.parametrize("strategy", ["stash", "patch"])
+class TestStash:
+    def test_push_and_pop(self, repo: Path, backend: str, strategy: str) -> None:
+        (repo / "a").write_text("changed\n")
+        git = Git(repo, stash_strategy=strategy)
+
+        assert git.stash_push() is True
+        assert (repo / "a").read_text() == "a\n"
+        assert git.pending_stash() is not None
+        assert (repo / ".git" / STATE_FILE).exists()
+
+        git.stash_pop()
+        assert (repo / "a").read_text() == "changed\n"
+        assert git.pending_stash() is None
+        assert not (repo / ".git" / STATE_FILE).exists()
+
+    def test_clean_tree(self, repo: Path, backend: str, strategy: str) -> None:
+        assert Git(repo, stash_strategy=strategy).stash_push() is False
+
+    def test_untracked_only(self, repo: Path, backend: str, strategy: str) -> None:
+        (repo / "new").write_text("new\n")
+        git = Git(repo, stash_strategy=strategy)
+
+        assert git.stash_push() is False
+        assert (repo / "new").exists()
+
+        assert git.stash_push(include_untracked=True) is True
+        assert not (repo / "new").exists()
+        git.stash_pop()
+        assert (repo / "new").read_text() == "new\n"
+
+    def test_auto_stash_nested(self, repo: Path, backend: str, strategy: str) -> None:
+        (repo / "a").write_text("changed\n")
+        git = Git(repo, stash_strategy=strategy)
+
+        with git.auto_stash() as outer:
+            with git.auto_stash() as inner:
+                assert (repo / "a").read_text() == "a\n"
+        assert (outer, inner) == (True, False)
+        assert (repo / "a").read_text() == "changed\n"
+
+    def test_interrupted_stash_blocks_the_next(
+        self, repo: Path, backend: str, strategy: str
+    ) -> None:
+        (repo / "a").write_text("first\n")
+        Git(repo, stash_strategy=strategy).stash_push()
+
+        # A new process finds the record of the stash that was never popped
+        git = Git(repo, stash_strategy=strategy)
+        (repo / "a").write_text("second\n")
+        with pytest.raises(GitError, match="never restored"):
+            git.stash_push()
+        assert (repo / "a").read_text() == "second\n"
+
+    def test_interrupted_stash_ignored_when_clean(
+        self, repo: Path, backend: str, strategy: str
+    ) -> None:
+        (repo / "a").write_text("first\n")
+        Git(repo, stash_strategy=strategy).stash_push()
+
+        git = Git(repo, stash_strategy=strategy)
+        assert git.stash_push() is False
+        assert git.pending_stash() is not None
+
+    def test_clear_state(self, repo: Path, backend: str, strategy: str) -> None:
+        (repo / "a").write_text("first\n")
+        Git(repo, stash_strategy=strategy).stash_push()
+
+        git = Git(repo, stash_strategy=strategy)
+        git.clear_state()
+        assert git.pending_stash() is None
+        (repo / "a").write_text("second\n")
+        assert git.stash_push() is True
+
+
+def test_stale_stash_record_is_cleared(repo: Path, run: Callable[..., str]) -> None:
+    (repo / "a").write_text("changed\n")
+    Git(repo).stash_push()
+    run("stash", "drop")
+
+    git = Git(repo)
+    assert git.pending_stash() is None
+    assert not (repo / ".git" / STATE_FILE).exists()
+
+
+def test_stale_patch_record_is_cleared(repo: Path) -> None:
+    (repo / "a").write_text("changed\n")
+    git = Git(repo, stash_strategy="patch")
+    git.stash_push()
+    Path(git.pending_stash()).unlink()
+
+    git = Git(repo, stash_strategy="patch")
+    assert git.pending_stash() is None
+    assert not (repo / ".git" / STATE_FILE).exists()
+
+
+def test_patch_pop_restores_the_recorded_patch(repo: Path) -> None:
+    (repo / "a").write_text("changed\n")
+    git = Git(repo, stash_strategy="patch")
+    git.stash_push()
+    recorded = Path(git.pending_stash())
+    # A leftover patch with a newer name must not be picked instead
+    (recorded.parent / f"{int(recorded.stem) + 1}.patch").write_text("garbage\n")
+
+    git.stash_pop()
+    assert (repo / "a").read_text() == "changed\n"
+    assert not recorded.exists()
+
+
+class TestDirty:
+    def test_clean(self, repo: Path, backend: str) -> None:
+        git = Git(repo)
+        assert (git.is_dirty(), git.is_dirty_tracked()) == (False, False)
+
+    def test_modified(self, repo: Path, backend: str) -> None:
+        (repo / "a").write_text("changed\n")
+        git = Git(repo)
+        assert (git.is_dirty(), git.is_dirty_tracked()) == (True, True)
+
+    def test_untracked(self, repo: Path, backend: str) -> None:
+        (repo / "sub").mkdir()
+        (repo / "sub" / "new").write_text("new\n")
+        git = Git(repo)
+        assert (git.is_dirty(), git.is_dirty_tracked()) == (True, False)
+
+    def test_ignored(self, repo: Path, backend: str, run: Callable[..., str]) -> None:
+        (repo / ".gitignore").write_text("*.log\n")
+        run("add", ".gitignore")
+        run("commit", "-q", "-m", "ignore")
+        (repo / "x.log").write_text("log\n")
+        assert Git(repo).is_dirty() is False
+
+    def test_staged_then_reverted(self, repo: Path, backend: str, run: Callable[..., str]) -> None:
+        (repo / "a").write_text("changed\n")
+        run("add", "a")
+        (repo / "a").write_text("a\n")
+        assert Git(repo).is_dirty_tracked() is True
+
+
+class TestBranches:
+    def test_branch_shadowed_by_tag(
+        self, repo: Path, backend: str, run: Callable[..., str]
+    ) -> None:
+        # %(refname:short) would print "heads/x" for this branch
+        run("branch", "x")
+        run("tag", "x")
+        git = Git(repo)
+        assert sorted(git.get_all_branches()) == ["main", "x"]
+        assert git.branches_exist(["x", "heads/x", "nope"]) == {
+            "x": True,
+            "heads/x": False,
+            "nope": False,
+        }
+        assert git.branch_exists("x") is True
+
+
+class TestDryMergeBatch:
+    @pytest.fixture
+    def branches(self, repo: Path, run: Callable[..., str]) -> None:
+        """main edits a; "conflict" edits it differently; "clean" adds a file."""
+        run("checkout", "-q", "-b", "conflict")
+        (repo / "a").write_text("conflict\n")
+        run("commit", "-q", "-am", "conflict")
+        run("checkout", "-q", "-b", "clean", "main")
+        (repo / "b").write_text("b\n")
+        run("add", "b")
+        run("commit", "-q", "-m", "clean")
+        run("checkout", "-q", "main")
+        (repo / "a").write_text("main\n")
+        run("commit", "-q", "-am", "main")
+
+    def test_results_in_order(self, repo: Path, branches: None) -> None:
+        results = Git(repo).dry_merge_batch(
+            [("main", "conflict"), ("main", "clean"), ("conflict", "main")]
+        )
+        assert [r.clean for r in results] == [False, True, False]
+        assert results[0].conflicts == ["a"]
+        assert results[1].conflicts == []
+        assert results[2].conflicts == ["a"]
+        assert all(len(r.tree) == 40 for r in results)
+
+    def test_leaves_the_tree_alone(
+        self, repo: Path, branches: None, run: Callable[..., str]
+    ) -> None:
+        Git(repo).dry_merge_batch([("main", "conflict")])
+        assert run("status", "--porcelain") == ""
+        assert (repo / "a").read_text() == "main\n"
+
+    def test_empty(self, repo: Path) -> None:
+        assert Git(repo).dry_merge_batch([]) == []
+
+    def test_unknown_rev(self, repo: Path, branches: None) -> None:
+        with pytest.raises(GitError):
+            Git(repo).dry_merge_batch([("main", "clean"), ("main", "nope")])
+
+
+class TestCatFileBatch:
+    def revs(self, run: Callable[..., str]) -> tuple[list[str], list[str | None]]:
+        """Lookups mixing existing and missing refs, with the expected answers."""
+        head = run("rev-parse", "HEAD")
+        revs = ["main" if i % 3 else "nope" for i in range(10)] + ["HEAD"]
+        return revs, [head if rev != "nope" else None for rev in revs]
+
+    def test_windows(
+        self, repo: Path, run: Callable[..., str], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(_CatFileBatch, "WINDOW", 3)
+        revs, expected = self.revs(run)
+        batch = _CatFileBatch(repo)
+        try:
+            assert batch.resolve_many(revs) == expected
+            assert batch.resolve("nope") is None
+        finally:
+            batch.close()
+
+    def test_batch_check_fallback(
+        self, repo: Path, run: Callable[..., str], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        # Make --batch-command fail the way Git before 2.36 rejects it
+        popen = subprocess.Popen
+
+        def old_git_popen(args: list[str], **kwargs: object) -> subprocess.Popen:
+            args = ["--no-such-option" if a.startswith("--batch-command") else a for a in args]
+            return popen(args, **kwargs)
+
+        monkeypatch.setattr(git_module.subprocess, "Popen", old_git_popen)
+        revs, expected = self.revs(run)
+        batch = _CatFileBatch(repo)
+        try:
+            assert batch.resolve_many(revs) == expected
+            assert batch._batch_command is False
+        finally:
+            batch.close()
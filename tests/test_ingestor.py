@@ -0,0 +1,91 @@
+"""Tests for the file hash cache of the ingestor: snapshot plus append-only log."""
+
+from pathlib import Path
+
+from ghoststack.brain.ingestor import FileIngestor
+from ghoststack.utils import jsonio
+
+
+def ingestor(repo_path: Path) -> FileIngestor:
+    """Build an ingestor for its hash cache alone; no index is needed for that."""
+    return FileIngestor(repo_path, None)
+
+
+def write_log(repo_path: Path, *lines: bytes) -> Path:
+    log = repo_path / ".ghoststack" / "file_hashes.log"
+    log.parent.mkdir(parents=True, exist_ok=True)
+    log.write_bytes(b"".join(lines))
+    return log
+
+
+def test_log_round_trip(tmp_path: Path) -> None:
+    first = ingestor(tmp_path)
+    first._log_hash("a.py", "h1", (1, 10))
+    first._log_hash("b.py", "h2")
+    first._log_hash("a.py", "h3", (2, 20))
+    first._flush_hash_log()
+
+    second = ingestor(tmp_path)
+    assert second._hash_cache == {"a.py": "h3", "b.py": "h2"}
+    assert second._stat_cache == {"a.py": (2, 20)}
+
+
+def test_log_replayed_over_snapshot(tmp_path: Path) -> None:
+    snapshot = tmp_path / ".ghoststack" / "file_hashes.json"
+    snapshot.parent.mkdir()
+    snapshot.write_bytes(jsonio.dumps({"a.py": ["old", 1, 10], "b.py": "h2", "c.py": "h4"}))
+    write_log(
+        tmp_path,
+        jsonio.dumps(["a.py", "new", 2, 20]) + b"\n",
+        # A None hash forgets the file
+        jsonio.dumps(["c.py", None]) + b"\n",
+    )
+
+    loaded = ingestor(tmp_path)
+    assert loaded._hash_cache == {"a.py": "new", "b.py": "h2"}
+    assert loaded._stat_cache == {"a.py": (2, 20)}
+
+
+def test_torn_last_line_is_truncated(tmp_path: Path) -> None:
+    good = jsonio.dumps(["a.py", "h1", 1, 10]) + b"\n"
+    log = write_log(tmp_path, good, b'["b.py", "h')
+
+    loaded = ingestor(tmp_path)
+    assert loaded._hash_cache == {"a.py": "h1"}
+    assert log.read_bytes() == good
+
+    # The next append starts on a line of its own
+    loaded._log_hash("c.py", "h3")
+    loaded._flush_hash_log()
+    assert ingestor(tmp_path)._hash_cache == {"a.py": "h1", "c.py": "h3"}
+
+
+def test_corrupt_line_is_skipped(tmp_path: Path) -> None:
+    write_log(
+        tmp_path,
+        b"not json\n",
+        jsonio.dumps(["a.py", "h1"]) + b"\n",
+    )
+    assert ingestor(tmp_path)._hash_cache == {"a.py": "h1"}
+
+
+def test_compaction(tmp_path: Path) -> None:
+    first = ingestor(tmp_path)
+    for i in range(50):
+        first._log_hash("a.py", f"h{i}", (i, i))
+    first._log_hash("b.py", "hb")
+    first._save_hash_cache()
+
+    # The log of one mostly rewritten file is folded into the snapshot
+    assert (tmp_path / ".ghoststack" / "file_hashes.log").stat().st_size == 0
+    loaded = ingestor(tmp_path)
+    assert loaded._hash_cache == {"a.py": "h49", "b.py": "hb"}
+    assert loaded._stat_cache == {"a.py": (49, 49)}
+
+
+def test_clear_hash_cache(tmp_path: Path) -> None:
+    first = ingestor(tmp_path)
+    first._log_hash("a.py", "h1")
+    first._save_hash_cache()
+    first.clear_hash_cache()
+    assert ingestor(tmp_path)._hash_cache == {}
@@ -0,0 +1,48 @@
+"""Tests that jsonio gives the same output with and without orjson."""
+
+import importlib.util
+
+import pytest
+
+from ghoststack.utils import jsonio
+
+DATA = {
+    "text": "héllo\n\"quoted\"",
+    "numbers": [0, -1, 2.5, 1e20],
+    "nested": {"empty_list": [], "empty_dict": {}, "flag": True, "nothing": None},
+}
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def encoder(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> str:
+    """Run a test with orjson (when installed) and with the stdlib json module."""
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(jsonio, "orjson", None)
+    return request.param
+
+
+def test_round_trip(encoder: str) -> None:
+    assert jsonio.loads(jsonio.dumps(DATA)) == DATA
+    assert jsonio.loads(jsonio.dumps(DATA).decode()) == DATA
+
+
+def test_non_str_keys(encoder: str) -> None:
+    assert jsonio.loads(jsonio.dumps({1: "a", 2.5: "b"})) == {"1": "a", "2.5": "b"}
+
+
+def test_default(encoder: str) -> None:
+    assert jsonio.loads(jsonio.dumps({"s": {1, 2}}, default=sorted)) == {"s": [1, 2]}
+
+
+def test_invalid(encoder: str) -> None:
+    with pytest.raises(ValueError):
+        jsonio.loads(b"{not json")
+
+
+@pytest.mark.skipif(importlib.util.find_spec("orjson") is None, reason="orjson not installed")
+def test_indent_parity(monkeypatch: pytest.MonkeyPatch) -> None:
+    fast = jsonio.dumps(DATA, indent=True)
+    monkeypatch.setattr(jsonio, "orjson", None)
+    assert fast == jsonio.dumps(DATA, indent=True)
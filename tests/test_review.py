@@ -0,0 +1,73 @@
+"""Tests for the diff parsing behind gs review."""
+
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from ghoststack.commands.review import _get_diff_contents, _get_diff_files
+from ghoststack.core.git import Git
+
+
+@pytest.fixture
+def feature(repo: Path, run: Callable[..., str]) -> Path:
+    """A "feature" branch off main with an edit, a rename, a binary and odd paths."""
+    (repo / "moved").write_text("".join(f"line {i}\n" for i in range(20)))
+    run("add", "moved")
+    run("commit", "-q", "-m", "moved")
+    run("checkout", "-q", "-b", "feature")
+    (repo / "a").write_text("a\nb\nc\n")
+    run("mv", "moved", "renamed")
+    (repo / "bin").write_bytes(b"\0\1\2")
+    (repo / "tab\there").write_text("x\n")
+    (repo / "new\nline").write_text("y\n")
+    run("add", "-A")
+    run("commit", "-q", "-m", "feature")
+    return repo
+
+
+def test_diff_files(feature: Path) -> None:
+    files = _get_diff_files(Git(feature), "main")
+    rows = {
+        path: (files.statuses[i], files.old_paths[i], files.additions[i], files.deletions[i])
+        for i, path in enumerate(files.paths)
+    }
+    assert rows == {
+        "a": ("M", None, 2, 0),
+        "renamed": ("R100", "moved", 0, 0),
+        "bin": ("A", None, 0, 0),
+        "tab\there": ("A", None, 1, 0),
+        "new\nline": ("A", None, 1, 0),
+    }
+    assert files.total_changes == 4
+
+
+def test_diff_files_as_dicts(feature: Path) -> None:
+    entries = {f["path"]: f for f in _get_diff_files(Git(feature), "main").as_list_of_dicts()}
+    assert entries["renamed"]["old_path"] == "moved"
+    assert "old_path" not in entries["a"]
+
+
+def test_diff_files_no_changes(repo: Path) -> None:
+    assert len(_get_diff_files(Git(repo), "main")) == 0
+
+
+def test_diff_contents(feature: Path) -> None:
+    diffs = _get_diff_contents(Git(feature), "main", ["a", "renamed", "bin"], ["moved"])
+    assert set(diffs) == {"a", "renamed", "bin"}
+    assert diffs["a"].startswith("diff --git a/a b/a\n")
+    assert "+b\n+c" in diffs["a"]
+    assert "rename from moved\nrename to renamed" in diffs["renamed"]
+    assert "Binary files" in diffs["bin"]
+
+
+def test_diff_contents_truncated(feature: Path) -> None:
+    diffs = _get_diff_contents(Git(feature), "main", ["a", "bin"], max_bytes=40)
+    # Only the file the cut falls in is kept, with the marker after it
+    assert list(diffs) == ["a"]
+    assert diffs["a"].endswith("more bytes)")
+    assert "... (diff truncated, " in diffs["a"]
+
+
+def test_diff_contents_empty(repo: Path) -> None:
+    assert _get_diff_contents(Git(repo), "main", []) == {}